@@ -0,0 +1,266 @@
+# End-to-end Benchmark
+# Times the dashboard's data functions and every tab render (through
+# streamlit.testing AppTest, in this process) against a database filled by
+# bench.synthetic_data, writes the timings as JSON and compares them with a
+# stored baseline. Exits non-zero when a timing regressed past the tolerance.
+#
+#   python -m bench.synthetic_data --scale 100k --backend sqlite
+#   python -m bench.app_bench --backend sqlite [--runs 5] [--only data|render]
+#   python -m bench.app_bench --backend sqlite --save-baseline
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from config import config
+from bench.synthetic_data import configure
+import hospital_dashboard as dashboard
+from db import overview_metrics
+from db.backup import run_backup
+from db.repository import get_repository
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# (name, role, show_* function or None for the whole dashboard)
+RENDERS = [
+    ("render.dashboard.admin", 'admin', None),
+    ("render.dashboard.doctor", 'doctor', None),
+    ("render.dashboard.receptionist", 'receptionist', None),
+    ("render.overview", 'admin', "show_overview"),
+    ("render.patients.admin", 'admin', "show_patients"),
+    ("render.patients.doctor", 'doctor', "show_patients"),
+    ("render.anonymization", 'admin', "show_anonymization"),
+    ("render.audit_logs", 'admin', "show_audit_logs"),
+    ("render.analytics", 'admin', "show_analytics"),
+    ("render.gdpr_settings", 'admin', "show_gdpr_settings"),
+    ("render.add_patient", 'receptionist', "show_add_patient"),
+]
+
+RENDER_SCRIPT = """
+import show
+show.{function}()
+"""
+
+
+def _timings(func, runs):
+    """Seconds per call of `func`, `runs` times"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summary(timings):
+    ordered = sorted(timings)
+    return {
+        'median': statistics.median(ordered),
+        'p95': ordered[min(math.ceil(len(ordered) * 0.95), len(ordered)) - 1],
+        'min': ordered[0],
+        'runs': len(ordered),
+    }
+
+
+def _users():
+    """{role: (user_id, username)} of the seeded users"""
+    with get_repository().backend.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT user_id, username, role FROM users ORDER BY user_id")
+        users = {role: (user_id, username) for user_id, username, role in cursor.fetchall()}
+        cursor.close()
+    return users
+
+
+def _scale():
+    """Row counts the timings were taken at"""
+    with get_repository().backend.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT (SELECT COUNT(*) FROM patients), (SELECT COUNT(*) FROM logs)")
+        patients, logs = cursor.fetchone() #type: ignore
+        cursor.close()
+    return {'patients': patients, 'logs': logs}
+
+
+def _sign_in(role, users):
+    """Session state of a signed-in user who already gave consent"""
+    user_id, username = users[role]
+    values = {
+        'logged_in': True, 'username': username, 'role': role, 'user_id': user_id,
+        'consent_given': True, 'system_start_time': datetime.now(),
+    }
+    for key, value in values.items():
+        st.session_state[key] = value
+    return values
+
+
+def benchmark_data(runs, users, progress=print):
+    """Time each data function; returns {name: summary}"""
+    _sign_in('admin', users)
+    repository = get_repository()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    metrics = repository.overview_metrics()
+    middle_patient = max(metrics['total_patients'] // 2, 1) #type: ignore
+    first_page = dashboard.get_logs(limit=100)
+    deep_cursor = (first_page[-1]['timestamp'] - timedelta(days=30), first_page[-1]['log_id']) if first_page else None
+
+    checks = [
+        ("data.get_patients.admin_first_page", lambda: dashboard.get_patients('admin')),
+        ("data.get_patients.admin_deep_page", lambda: dashboard.get_patients('admin', after=middle_patient)),
+        ("data.get_patients.doctor_first_page", lambda: dashboard.get_patients('doctor')),
+        # Drop the process-wide overview cache so every run measures the query
+        ("data.count_patients", lambda: (overview_metrics.invalidate(), dashboard.count_patients('doctor'))),
+        ("data.get_logs.first_page", lambda: dashboard.get_logs(limit=100)),
+        ("data.get_logs.deep_page", lambda: dashboard.get_logs(limit=100, after=deep_cursor)),
+        ("data.get_logs.by_action", lambda: dashboard.get_logs(action="Export Data", limit=100)),
+        ("data.get_logs.one_day", lambda: dashboard.get_logs(start_date=today - timedelta(days=7), end_date=today - timedelta(days=7), limit=None)),
+        ("data.get_activity_stats.7_days", lambda: dashboard.get_activity_stats(today - timedelta(days=6), tomorrow)),
+        ("data.get_activity_stats.365_days", lambda: dashboard.get_activity_stats(today - timedelta(days=364), tomorrow)),
+        ("data.overview_metrics", repository.overview_metrics),
+        ("data.check_data_retention", dashboard.check_data_retention),
+    ]
+    results = {}
+    for name, func in checks:
+        func()  # warm caches and connections
+        results[name] = _summary(_timings(func, runs))
+        progress(f"{name:<45} {results[name]['median'] * 1000:>10.1f} ms")
+
+    # Writes: one run each, leaving the data as generated
+    if config.DB_BACKEND == 'mysql':
+        with tempfile.TemporaryDirectory() as backup_dir:
+            results["data.backup.full"] = _summary(_timings(lambda: run_backup("full", backup_dir), 1))
+        progress(f"{'data.backup.full':<45} {results['data.backup.full']['median'] * 1000:>10.1f} ms")
+    return results
+
+
+def benchmark_renders(runs, users, timeout, progress=print):
+    """Time each dashboard and tab render through AppTest; returns {name: summary}"""
+    results = {}
+    for name, role, function in RENDERS:
+        if function is None:
+            app = AppTest.from_file(os.path.join(ROOT_DIR, "main.py"), default_timeout=timeout)
+        else:
+            app = AppTest.from_string(RENDER_SCRIPT.format(function=function), default_timeout=timeout)
+        for key, value in _sign_in(role, users).items():
+            app.session_state[key] = value
+
+        app.run()  # first run imports modules and fills caches
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - start)
+        if app.exception:
+            results[name] = {'error': app.exception[0].message}
+            progress(f"{name:<45} {'ERROR':>10}  {app.exception[0].message}")
+            continue
+        results[name] = _summary(timings)
+        progress(f"{name:<45} {results[name]['median'] * 1000:>10.1f} ms")
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance, min_delta):
+    """Regressed benchmark names: median slower than baseline by more than
+    `tolerance` (a fraction) and by at least `min_delta` seconds"""
+    # Row counts drift a little: every benchmark run adds audit log events
+    scale, base_scale = current['meta']['scale'], baseline['meta'].get('scale') or {}
+    if current['meta']['backend'] != baseline['meta'].get('backend') or any(
+            abs(scale[table] - base_scale.get(table, 0)) > 0.1 * scale[table] for table in scale):
+        print(f"warning: baseline was recorded at {base_scale} on {baseline['meta'].get('backend')}")
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or 'median' not in base or 'median' not in result:
+            print(f"{name:<45} {'-':>10} {'-':>10} {'n/a':>8}")
+            continue
+        change = result['median'] / base['median'] - 1 if base['median'] else 0
+        regressed = change > tolerance and result['median'] - base['median'] >= min_delta
+        print(f"{name:<45} {base['median'] * 1000:>8.1f}ms {result['median'] * 1000:>8.1f}ms {change:>+7.0%}"
+              + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time data functions and tab renders and compare with a baseline")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--only", choices=["data", "render"], help="run one group of benchmarks")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write this run's JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of the median (fraction)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="ignore slowdowns under this many seconds")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per render")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], help="defaults to DB_BACKEND")
+    parser.add_argument("--database", help="MySQL database filled by bench.synthetic_data")
+    parser.add_argument("--sqlite-path", help="SQLite file filled by bench.synthetic_data")
+    args = parser.parse_args(argv)
+
+    configure(args.backend, args.database, args.sqlite_path)
+    users = _users()
+
+    results = {}
+    if args.only != "render":
+        results.update(benchmark_data(args.runs, users))
+    if args.only != "data":
+        results.update(benchmark_renders(args.runs, users, args.timeout))
+
+    current = {
+        'meta': {
+            'backend': config.DB_BACKEND,
+            'scale': _scale(),
+            'runs': args.runs,
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; record one with --save-baseline")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance, args.min_delta)
+    errors = [name for name, result in results.items() if 'error' in result]
+    if regressions or errors:
+        print(f"\n{len(regressions)} regression(s), {len(errors)} error(s)")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# Import-time Budget Check
+# Measures the login path's cold import (`python -X importtime -c "import main"`)
+# in fresh interpreters, prints the heaviest modules and exits non-zero when
+# the median exceeds the budget or a module the login page must not load
+# (pandas, plotly.express, pyarrow, cryptography) shows up.
+#
+#   python -m bench.import_time [--module main] [--runs 5] [--budget-ms 1000]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use by the dashboard, never for the login form. (Streamlit
+# itself imports plotly.graph_objects, a cheap lazy-loading stub.)
+LOGIN_FORBIDDEN = ("pandas", "plotly.express", "pyarrow", "cryptography")
+LOGIN_BUDGET_MS = 1000
+
+
+def measure(module):
+    """One cold import in a new interpreter; returns {module: (self_us, cumulative_us)} and total µs"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            total += int(cumulative_us)  # top-level entries add up to the whole import
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cold import time of the login path against a budget")
+    parser.add_argument("--module", default="main", help="module to import (main is the login path)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=LOGIN_BUDGET_MS, help="allowed median import time")
+    parser.add_argument("--top", type=int, default=15, help="heaviest modules to list")
+    args = parser.parse_args(argv)
+
+    measure(args.module)  # warm the OS file cache
+    runs = [measure(args.module) for _ in range(args.runs)]
+    modules = runs[-1][0]
+    median_ms = statistics.median(total for _, total in runs) / 1000
+
+    print(f"{'module':<50} {'self ms':>9} {'cumul. ms':>10}")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}")
+
+    failures = []
+    forbidden = [package for package in LOGIN_FORBIDDEN
+                 if any(name == package or name.startswith(package + ".") for name in modules)]
+    if args.module == "main" and forbidden:
+        failures.append(f"login path imports {', '.join(forbidden)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    print(f"\nimport {args.module}: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Patient Search Benchmark
+# Latency of Repository.search_patients (FULLTEXT on MySQL, FTS5 on SQLite)
+# against the bench.synthetic_data database, next to the LIKE '%word%'
+# table scan it replaces.
+#
+#   python -m bench.search_bench --generate --patients 1000000 [--backend sqlite]
+#   python -m bench.search_bench [--backend sqlite] [--runs 20]
+import argparse
+import statistics
+import sys
+import time
+import crypto_service
+from config import config
+from bench import synthetic_data
+from db.repository import get_repository
+
+# (name, view, query, offset)
+SEARCHES = [
+    ("common word", 'admin', "hypertension", 0),
+    ("common word, page 11", 'admin', "hypertension", 500),
+    ("word prefix", 'admin', "diab", 0),
+    ("two words", 'admin', "chronic asthma", 0),
+    ("rare word", 'admin', "sarcoidosis", 0),
+    ("doctor view", 'doctor', "pneumonia", 0),
+    ("patient id", 'admin', None, 0),
+]
+
+LIKE_SCAN = """
+    SELECT patient_id, {column} FROM patients
+    WHERE {column} LIKE %s
+    ORDER BY patient_id DESC
+    LIMIT %s
+"""
+
+
+def _percentiles(timings):
+    ordered = sorted(timings)
+    return statistics.median(ordered) * 1000, ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000
+
+
+def _timed(func, runs):
+    func()  # warm caches
+    timings, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def _like_scan(repository, word, limit, column="diagnosis"):
+    with repository.backend.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(LIKE_SCAN.format(column=column), (f"%{word}%", limit))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ranked patient search at scale")
+    parser.add_argument("--generate", action="store_true", help="recreate the benchmark database first")
+    parser.add_argument("--patients", type=int, default=1_000_000, help="patients to generate with --generate")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per search")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], help="defaults to DB_BACKEND")
+    parser.add_argument("--database", help="MySQL database filled by bench.synthetic_data")
+    parser.add_argument("--sqlite-path", help="SQLite file filled by bench.synthetic_data")
+    args = parser.parse_args(argv)
+
+    synthetic_data.configure(args.backend, args.database, args.sqlite_path)
+    if args.generate:
+        synthetic_data.recreate_database()
+        synthetic_data.generate_patients(args.patients, 6, 0.0, progress=lambda message: None)
+    repository = get_repository()
+    total = repository.overview_metrics()['total_patients'] #type: ignore
+    print(f"{total:,} patients on {config.DB_BACKEND}, {args.runs} runs per search\n")
+    print(f"{'search':<24} {'rows':>6} {'p50 ms':>9} {'p95 ms':>9} {'LIKE p50 ms':>12}")
+
+    for name, view, query, offset in SEARCHES:
+        query = query or str(total // 2)
+        timings, rows = _timed(lambda: repository.search_patients(view, query, args.page_size, offset), args.runs)
+        p50, p95 = _percentiles(timings)
+        like = ""
+        if not query.isdigit() and offset == 0:
+            like_timings, _ = _timed(lambda: _like_scan(repository, query.split()[0], args.page_size), max(args.runs // 4, 1))
+            like = f"{_percentiles(like_timings)[0]:>12.1f}"
+        print(f"{name:<24} {len(rows):>6} {p50:>9.1f} {p95:>9.1f} {like}")
+
+    # Exact contact lookup through the blind index (what the admin search box
+    # does with a phone number), next to a LIKE scan of the contact column
+    contact = repository.search_patients('admin', str(total // 3))[0]['contact']
+    timings, rows = _timed(lambda: repository.patients_by_contact(
+        'admin', crypto_service.blind_index('contact', contact), args.page_size), args.runs)
+    p50, p95 = _percentiles(timings)
+    like_timings, _ = _timed(lambda: _like_scan(repository, contact, args.page_size, 'contact'), max(args.runs // 4, 1))
+    print(f"{'contact number':<24} {len(rows):>6} {p50:>9.1f} {p95:>9.1f} {_percentiles(like_timings)[0]:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# Synthetic Data Generator
+# Recreates a scratch database on the chosen backend and fills it with
+# deterministic patients (some with encrypted identity fields, all
+# anonymized as on insert) and months of audit logs, for
+# bench.app_bench and manual load testing.
+#
+#   python -m bench.synthetic_data --scale 1m [--backend sqlite] [--months 6] [--seed 42]
+#   python -m bench.synthetic_data --patients 50000 --logs 2000000
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import mysql.connector
+from config import config
+import crypto_service
+from db.backend import get_backend
+from db.db import bootstrap_schema
+from db.repository import get_repository
+
+# Rows of each table per --scale preset
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+BENCH_DATABASE = "hospital_bench"
+BENCH_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench.db")
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Emma", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kavya", "Liam"]
+LAST_NAMES = ["Smith", "Garcia", "Nguyen", "Okafor", "Schmidt", "Rossi", "Kowalski", "Tanaka", "Silva", "Haddad"]
+DIAGNOSES = ["Hypertension", "Type 2 diabetes", "Asthma", "Migraine", "Fractured wrist", "Influenza",
+             "Pneumonia", "Anxiety disorder", "Appendicitis", "Routine checkup"]
+# Free-text notes appended to the diagnosis, so full-text search has varied
+# words to rank; RARE_NOTE marks about one patient in a thousand
+NOTES = ["chronic", "acute", "mild", "severe", "recurring", "stable", "improving", "referred to cardiology",
+         "referred to neurology", "follow-up in two weeks", "medication adjusted", "bloodwork ordered",
+         "x-ray ordered", "physiotherapy recommended", "admitted overnight", "discharged home"]
+RARE_NOTE = "suspected sarcoidosis"
+LOG_ACTIONS = ["Login", "Logout", "View Patients", "Add Patient", "Anonymize Data", "GDPR Consent",
+               "View Logs", "Export Data"]
+
+INSERT_PATIENTS = """
+    INSERT INTO patients (name, contact, diagnosis, encrypted_name, encrypted_contact, name_index, contact_index,
+                          anonymized_name, anonymized_contact, date_added, data_retention_date, is_anonymized)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def configure(backend=None, database=None, sqlite_path=None):
+    """Point config, and so get_backend(), at the benchmark database
+
+    Call before anything opens a connection in this process.
+    """
+    # Benchmark data is synthetic, so the built-in keys are fine
+    config.DEMO_MODE = True
+    if backend:
+        config.DB_BACKEND = backend
+    if config.DB_BACKEND == 'sqlite':
+        config.SQLITE_PATH = sqlite_path or BENCH_SQLITE_PATH
+    else:
+        config.DB_CONFIG['database'] = database or BENCH_DATABASE
+
+
+def recreate_database():
+    """Drop the configured benchmark database and create an empty schema"""
+    if config.DB_BACKEND == 'sqlite':
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(config.SQLITE_PATH + suffix):
+                os.remove(config.SQLITE_PATH + suffix)
+        get_backend().bootstrap_schema()
+        return
+    server = dict(config.DB_CONFIG)
+    database = server.pop('database')
+    connection = mysql.connector.connect(**server)
+    try:
+        connection.cursor().execute(f"DROP DATABASE IF EXISTS {database}")
+    finally:
+        connection.close()
+    bootstrap_schema(config.DB_CONFIG)
+
+
+def generate_patients(count, months, encrypted_share, seed=42, batch_size=5000, progress=print):
+    """Insert `count` patients added over the last `months` months, oldest first
+
+    `encrypted_share` of them carry encrypted name/contact. Expects an empty
+    patients table (patient_ids from 1).
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    span = months * 30 * 86400
+    backend = get_backend()
+    with backend.connection() as connection:
+        cursor = connection.cursor()
+        for start in range(0, count, batch_size):
+            rows = []
+            for patient_id in range(start + 1, min(start + batch_size, count) + 1):
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                contact = f"555-{rng.randrange(10_000_000):07d}"
+                added = now - timedelta(seconds=span * (count - patient_id) // count)
+                retention = (added + timedelta(days=rng.randint(30, 365))).date()
+                rows.append([
+                    name, contact, _diagnosis(rng), None, None,
+                    crypto_service.blind_index('name', name), crypto_service.blind_index('contact', contact),
+                    f"ANON_{patient_id:04d}", f"XXX-XXX-{contact[-4:]}",
+                    added, retention, True
+                ])
+            encrypted = [row for row in rows if rng.random() < encrypted_share]
+            if encrypted:
+                names = crypto_service.encrypt_many([row[0] for row in encrypted])
+                contacts = crypto_service.encrypt_many([row[1] for row in encrypted])
+                for row, encrypted_name, encrypted_contact in zip(encrypted, names, contacts):
+                    row[3], row[4] = encrypted_name, encrypted_contact
+            cursor.executemany(INSERT_PATIENTS, [tuple(row) for row in rows])
+            connection.commit()
+            progress(f"patients: {start + len(rows):,} / {count:,}")
+        cursor.close()
+
+
+def _diagnosis(rng):
+    note = RARE_NOTE if rng.random() < 0.001 else ", ".join(rng.sample(NOTES, 2))
+    return f"{rng.choice(DIAGNOSES)}; {note}"
+
+
+def generate_logs(count, months, seed=42, batch_size=5000, progress=print):
+    """Insert `count` audit events spread over the last `months` months
+
+    Goes through Repository.insert_logs, so the activity rollup stays current.
+    """
+    rng = random.Random(seed + 1)
+    now = datetime.now().replace(microsecond=0)
+    span = months * 30 * 86400
+    repository = get_repository()
+    users = _users(repository)
+    for start in range(0, count, batch_size):
+        events = []
+        for i in range(start, min(start + batch_size, count)):
+            if rng.random() < 0.02:
+                events.append((None, None, "Failed Login", now - timedelta(seconds=rng.randrange(span)), "Synthetic failed login"))
+                continue
+            user_id, role = rng.choice(users)
+            timestamp = now - timedelta(seconds=rng.randrange(span))
+            events.append((user_id, role, rng.choice(LOG_ACTIONS), timestamp, f"Synthetic event {i}"))
+        repository.insert_logs(events)
+        progress(f"logs: {start + len(events):,} / {count:,}")
+
+
+def _users(repository):
+    with repository.backend.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT user_id, role FROM users ORDER BY user_id")
+        users = cursor.fetchall()
+        cursor.close()
+    return users
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recreate a benchmark database filled with synthetic patients and logs")
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="rows per table (overridden by --patients / --logs)")
+    parser.add_argument("--patients", type=int, help="patients to generate")
+    parser.add_argument("--logs", type=int, help="log events to generate")
+    parser.add_argument("--months", type=int, default=6, help="months of history to spread rows over")
+    parser.add_argument("--encrypted", type=float, default=0.3, help="share of patients with encrypted fields")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], help="defaults to DB_BACKEND")
+    parser.add_argument("--database", help=f"MySQL database to recreate (default {BENCH_DATABASE})")
+    parser.add_argument("--sqlite-path", help="SQLite file to recreate (default bench/bench.db)")
+    args = parser.parse_args(argv)
+
+    configure(args.backend, args.database, args.sqlite_path)
+    patients = SCALES[args.scale] if args.patients is None else args.patients
+    logs = SCALES[args.scale] if args.logs is None else args.logs
+
+    started = time.perf_counter()
+    recreate_database()
+    generate_patients(patients, args.months, args.encrypted, args.seed)
+    generate_logs(logs, args.months, args.seed)
+    print(f"Generated {patients:,} patients and {logs:,} logs on {config.DB_BACKEND} "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,3 +23,94 @@ DB_CONFIG = {
     'database': os.getenv("DB_NAME") or "hospital_db",
     'port': int(os.getenv("DB_PORT") or 3306)
 }
+
+# Connection pool configuration
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 10)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 5)  # seconds to wait for a free connection
+
+# Audit log writer configuration
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE") or 10000)
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE") or 200)
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL") or 1.0)  # seconds between flushes
+AUDIT_ENQUEUE_TIMEOUT = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT") or 0.5)  # seconds to wait on a full queue
+
+# CSV export configuration
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE") or 5000)  # rows fetched per round trip
+EXPORT_DIR = os.getenv("EXPORT_DIR") or None  # temporary files go to the system temp dir by default
+
+# Parquet backup configuration
+
+BACKUP_DIR = os.getenv("BACKUP_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backups")
+# Incrementals re-read patients stamped this long before the previous snapshot,
+# so rows written by a transaction still open at snapshot time are not missed
+BACKUP_OVERLAP_SECONDS = int(os.getenv("BACKUP_OVERLAP_SECONDS") or 600)
+
+# Encryption configuration
+
+# The built-in ENCRYPTION_KEYS and BLIND_INDEX_KEY below are public. Unless
+# DEMO_MODE is set (demos and benchmarks), the app warns while either is in
+# use and turns off what it would protect: Fernet encryption of new values
+# and the blind-index lookups (duplicate check, contact search, backfill).
+DEMO_MODE = (os.getenv("DEMO_MODE") or "").lower() in ("1", "true", "yes")
+
+# Fernet key ring (store it securely in production; override via .env).
+# ENCRYPTION_KEYS is comma-separated, newest first: values are encrypted
+# with the first key and decrypted with whichever key matches, so a retired
+# key stays listed until `python -m db.key_rotation` has re-encrypted every
+# row under the new one. A single ENCRYPTION_KEY is still accepted.
+ENCRYPTION_KEYS = [
+    key.strip().encode()
+    for key in (os.getenv("ENCRYPTION_KEYS") or os.getenv("ENCRYPTION_KEY") or "8cozhW9kSi6zJQw3xLvMp_6T3Nq3qjWPHvXFnwi4IxE=").split(",")
+    if key.strip()
+]
+ENCRYPTION_KEYS_ARE_DEFAULT = not (os.getenv("ENCRYPTION_KEYS") or os.getenv("ENCRYPTION_KEY"))
+ENCRYPTION_KEY = ENCRYPTION_KEYS[0]  # primary key, used for new values
+KEY_ROTATION_CHUNK_SIZE = int(os.getenv("KEY_ROTATION_CHUNK_SIZE") or 20000)  # patient_id range per rotation transaction
+CRYPTO_PARALLEL_THRESHOLD = int(os.getenv("CRYPTO_PARALLEL_THRESHOLD") or 20000)  # values per batch before using worker processes
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS") or 0) or None  # None = one per CPU
+
+# Blind index HMAC key for name/contact lookups; keep it apart from the
+# Fernet key (changing it needs `python -m db.blind_index --rebuild`).
+# Phone numbers are few enough to brute-force offline from an index made
+# with a known key, so new patients get no index while it is the default.
+BLIND_INDEX_KEY = (os.getenv("BLIND_INDEX_KEY") or "ixm2MRyEybpw26xv7-uGX0gUon05uY3o4nce5E5JQTA=").encode()
+BLIND_INDEX_KEY_IS_DEFAULT = not os.getenv("BLIND_INDEX_KEY")
+BLIND_INDEX_BATCH_SIZE = int(os.getenv("BLIND_INDEX_BATCH_SIZE") or 5000)  # patients per backfill transaction
+
+# Bulk import configuration
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE") or 5000)  # rows per INSERT batch and transaction
+
+# Overview metrics cache
+
+OVERVIEW_CACHE_TTL = float(os.getenv("OVERVIEW_CACHE_TTL") or 15)  # seconds, shared by all sessions
+LOG_ACTIONS_CACHE_TTL = float(os.getenv("LOG_ACTIONS_CACHE_TTL") or 300)  # seconds, audit log action filter
+
+# Retention purge configuration
+
+RETENTION_PURGE_BATCH_SIZE = int(os.getenv("RETENTION_PURGE_BATCH_SIZE") or 1000)  # patients deleted per transaction
+RETENTION_PURGE_PAUSE = float(os.getenv("RETENTION_PURGE_PAUSE") or 0.1)  # seconds to sleep between batches
+
+# Audit log partitioning and archive
+
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive")
+LOG_HOT_MONTHS = int(os.getenv("LOG_HOT_MONTHS") or 3)  # whole months kept in MySQL before archiving
+LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD") or 2)  # empty future monthly partitions kept ready
+
+# Live audit feeds (Recent Activity, first audit log page)
+
+LOG_FEED_REFRESH_OPTIONS = [int(s) for s in (os.getenv("LOG_FEED_REFRESH_OPTIONS") or "5,10,30,60").split(",")]  # auto-refresh choices, seconds
+
+# Storage backend
+
+DB_BACKEND = (os.getenv("DB_BACKEND") or "mysql").lower()  # mysql | sqlite
+SQLITE_PATH = os.getenv("SQLITE_PATH") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hospital.db")
+
+# Query and render instrumentation
+
+INSTRUMENTATION_ENABLED = (os.getenv("INSTRUMENTATION_ENABLED") or "true").lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)  # serve Prometheus /metrics here; 0 = off
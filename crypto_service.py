@@ -0,0 +1,181 @@
+# Crypto Service
+# Cached Fernet ciphers over the configured key ring, batch and
+# multi-process encrypt/decrypt/rotate, and the keyed blind indexes that
+# make encrypted fields searchable by equality.
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from config import config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000  # values per task handed to a worker process
+
+_NOT_DIGITS = re.compile(r"\D")
+_WHITESPACE = re.compile(r"\s+")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def get_cipher(key=None):
+    """Cipher for one key or a tuple of keys, built once per process
+
+    A tuple (by default the ENCRYPTION_KEYS ring) gives a MultiFernet that
+    encrypts with its first key and decrypts tokens from any of them.
+    """
+    key = key or tuple(config.ENCRYPTION_KEYS)
+    if isinstance(key, tuple):
+        return MultiFernet([Fernet(k) for k in key])
+    return Fernet(key)
+
+
+def key_fingerprint(key):
+    """Short stable ID of a key for status pages and rotation checkpoints; reveals nothing about it"""
+    return hashlib.sha256(key).hexdigest()[:12]
+
+
+def encrypt(value, key=None):
+    """Encrypt one string"""
+    return get_cipher(key).encrypt(value.encode()).decode()
+
+
+def decrypt(token, key=None):
+    """Decrypt one token"""
+    return get_cipher(key).decrypt(token.encode()).decode()
+
+
+def encrypt_many(values, key=None, parallel=None):
+    """Encrypt a list or pandas Series of strings; None stays None
+
+    `parallel=None` spreads batches larger than CRYPTO_PARALLEL_THRESHOLD
+    across worker processes. A Series comes back as a Series with the same index.
+    """
+    return _map(_encrypt_chunk, values, key, parallel)
+
+
+def decrypt_many(tokens, key=None, parallel=None):
+    """Decrypt a list or pandas Series of tokens; None and invalid tokens give None"""
+    return _map(_decrypt_chunk, tokens, key, parallel)
+
+
+def rotate_many(tokens, key=None, parallel=None):
+    """Re-encrypt tokens under the first key of a key ring; None and tokens no key opens give None"""
+    return _map(_rotate_chunk, tokens, key, parallel)
+
+
+def _map(func, values, key, parallel):
+    items = values.tolist() if hasattr(values, 'tolist') else list(values)
+    if parallel is None:
+        workers = config.CRYPTO_WORKERS or os.cpu_count() or 1
+        parallel = workers > 1 and len(items) >= config.CRYPTO_PARALLEL_THRESHOLD
+    if parallel and len(items) > CHUNK_SIZE:
+        chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+        result = [value for chunk in get_executor().map(func, chunks, repeat(key)) for value in chunk]
+    else:
+        result = func(items, key)
+    if hasattr(values, 'index') and hasattr(values, 'tolist'):
+        return type(values)(result, index=values.index, name=values.name)
+    return result
+
+
+def _encrypt_chunk(values, key):
+    cipher = get_cipher(key)
+    return [None if value is None else cipher.encrypt(value.encode()).decode() for value in values]
+
+
+def _decrypt_chunk(tokens, key):
+    cipher = get_cipher(key)
+    result = []
+    for token in tokens:
+        try:
+            result.append(None if token is None else cipher.decrypt(token.encode()).decode())
+        except InvalidToken:
+            result.append(None)
+    return result
+
+
+def normalize(field, value):
+    """Canonical form a blind index hashes: contacts keep their digits, names ignore case and spacing"""
+    if field == 'contact':
+        return _NOT_DIGITS.sub("", value)
+    return _WHITESPACE.sub(" ", value).strip().casefold()
+
+
+def encryption_enabled():
+    """Whether new values may be encrypted: not under the public default key outside DEMO_MODE"""
+    return config.DEMO_MODE or not config.ENCRYPTION_KEYS_ARE_DEFAULT
+
+
+def blind_index_enabled():
+    """Whether blind indexes may be computed: not with the public default key outside DEMO_MODE"""
+    return config.DEMO_MODE or not config.BLIND_INDEX_KEY_IS_DEFAULT
+
+
+@lru_cache(maxsize=1)
+def default_key_warnings():
+    """One message per public default key in use (logged once per process)"""
+    warnings = []
+    if config.ENCRYPTION_KEYS_ARE_DEFAULT:
+        warnings.append("ENCRYPTION_KEYS is not set, so the public built-in Fernet key is in use"
+                        + ("." if config.DEMO_MODE else "; encryption of new records is disabled."))
+    if config.BLIND_INDEX_KEY_IS_DEFAULT:
+        warnings.append("BLIND_INDEX_KEY is not set, so the public built-in HMAC key is in use"
+                        + ("." if config.DEMO_MODE else "; duplicate checks and contact search are disabled "
+                                                        "and new patients get no blind index."))
+    for message in warnings:
+        logger.warning(message)
+    return tuple(warnings)
+
+
+def blind_index(field, value, key=None):
+    """HMAC-SHA256 (hex) of a normalized 'name' or 'contact'; None stays None
+
+    Deterministic, unlike Fernet, so equal values can be matched with an
+    indexed equality query without decrypting anything. The field is part
+    of the message, so a name and a contact never share an index. Also None
+    while blind indexes are disabled (see blind_index_enabled); such rows are
+    filled by `python -m db.blind_index` once BLIND_INDEX_KEY is set.
+    """
+    if value is None or (key is None and not blind_index_enabled()):
+        return None
+    message = f"{field}:{normalize(field, value)}".encode()
+    return hmac.new(key or config.BLIND_INDEX_KEY, message, hashlib.sha256).hexdigest()
+
+
+def blind_index_many(field, values, key=None):
+    """blind_index over a list of values"""
+    return [blind_index(field, value, key) for value in values]
+
+
+def _rotate_chunk(tokens, key):
+    cipher = get_cipher(key)
+    result = []
+    for token in tokens:
+        try:
+            result.append(None if token is None else cipher.rotate(token.encode()).decode())
+        except InvalidToken:
+            result.append(None)
+    return result
+
+
+def get_executor():
+    """Process pool shared by parallel batches (spawned, so safe under Streamlit's threads)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=config.CRYPTO_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
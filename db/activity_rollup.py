@@ -0,0 +1,104 @@
+# Activity Rollup
+# Hourly event counts keyed by (hour_bucket, action, role), maintained
+# incrementally from the log_id watermark in rollup_watermark. Log writes
+# (Repository.insert_logs) call lock_watermark() before inserting a batch and
+# roll_up() after, in one transaction, so concurrent writers serialise on
+# the watermark row and no uncommitted log_id can be skipped. `sql` is the
+# dialect module; it defaults to MySQL for the MySQL-only tools.
+#
+# Months moved to the cold archive (db/log_archive.py) are no longer in
+# logs, but their counts stay in the rollup. A rebuild therefore re-counts
+# the archived Parquet segments as well as the hot table; finish any
+# interrupted `log_archive maintain` first, since rows still in its
+# staging table are in neither.
+#
+#   python -m db.activity_rollup [--rebuild]
+import argparse
+import os
+import sys
+from config import config
+from db import log_archive, queries
+from db.backend import get_backend
+
+WATERMARK_NAME = 'activity_rollup'
+
+
+def lock_watermark(cursor, sql=queries):
+    """Lock the watermark row for this transaction; returns the last rolled-up log_id"""
+    cursor.execute(sql.LOCK_WATERMARK, (WATERMARK_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def roll_up(cursor, last_log_id, sql=queries):
+    """Fold logs above the watermark into the rollup; returns the new watermark"""
+    cursor.execute("SELECT COALESCE(MAX(log_id), 0) FROM logs")
+    upper = cursor.fetchone()[0] #type: ignore
+    if upper > last_log_id:
+        cursor.execute(sql.ROLL_UP_ACTIVITY, (last_log_id, upper))
+        cursor.execute(
+            "UPDATE rollup_watermark SET last_log_id = %s WHERE name = %s",
+            (upper, WATERMARK_NAME)
+        )
+    return upper
+
+
+def reset(cursor):
+    """Empty the rollup so the next roll_up() rebuilds it from all logs"""
+    cursor.execute("DELETE FROM activity_rollup")
+    cursor.execute("UPDATE rollup_watermark SET last_log_id = 0 WHERE name = %s", (WATERMARK_NAME,))
+
+
+def roll_up_archive(cursor, sql=queries, archive_dir=None):
+    """Add the hourly counts of every archived log segment to the rollup; returns the rows counted"""
+    segments = log_archive.load_segments(archive_dir)
+    if not segments:
+        return 0
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    archive_dir = archive_dir or config.LOG_ARCHIVE_DIR
+    counted = 0
+    # One segment (a month) at a time; only three columns are read
+    for segment in segments:
+        rows = ds.dataset(os.path.join(archive_dir, segment['file'])).to_table(columns=['timestamp', 'action', 'role'])
+        counts = pa.table({
+            'hour_bucket': pc.floor_temporal(rows['timestamp'], unit='hour'),
+            'action': pc.fill_null(rows['action'], ''),
+            'role': pc.fill_null(rows['role'], ''),
+        }).group_by(['hour_bucket', 'action', 'role']).aggregate([([], 'count_all')])
+        cursor.executemany(sql.ADD_ACTIVITY_COUNTS, list(zip(*(counts[column].to_pylist() for column in
+                                                                ('hour_bucket', 'action', 'role', 'count_all')))))
+        counted += rows.num_rows
+    return counted
+
+
+def refresh(rebuild=False, archive_dir=None):
+    """Catch the rollup up with logs written outside the audit writer (e.g. restores)
+
+    `rebuild` recomputes it from the hot logs plus the archived segments.
+    """
+    backend = get_backend()
+    with backend.connection() as connection:
+        cursor = connection.cursor()
+        last_log_id = lock_watermark(cursor, backend.sql)
+        if rebuild:
+            reset(cursor)
+            roll_up_archive(cursor, backend.sql, archive_dir)
+            last_log_id = 0
+        watermark = roll_up(cursor, last_log_id, backend.sql)
+        connection.commit()
+        cursor.close()
+    return watermark
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catch up or rebuild the hourly activity rollup")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollup from every hot and archived log row")
+    args = parser.parse_args(argv)
+    print(f"Activity rollup current up to log_id {refresh(args.rebuild)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
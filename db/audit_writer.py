@@ -0,0 +1,163 @@
+# Asynchronous Audit Log Writer
+import atexit
+import logging
+import queue
+import threading
+import time
+from mysql.connector import Error
+from config import config
+import instrumentation
+from db.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """Background thread that drains a bounded queue of log events in batches"""
+
+    def __init__(self, queue_size, batch_size, flush_interval, enqueue_timeout):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'sync_writes': 0,
+            'backpressure': 0,
+            'failed': 0,
+        }
+
+    def start(self):
+        """Start the writer thread if it is not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, event):
+        """Queue an event; writes it inline if the queue stays full (backpressure)"""
+        self.start()
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+            self._count('enqueued')
+        except queue.Full:
+            self._count('backpressure')
+            self.write_sync([event])
+
+    def write_sync(self, events):
+        """Write events immediately on the caller's thread"""
+        self._insert(events)
+        self._count('sync_writes', len(events))
+
+    def flush(self):
+        """Block until every queued event has been written"""
+        self._queue.join()
+
+    def shutdown(self, timeout=5.0):
+        """Stop the writer thread after a final flush"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Audit writer queue still full at shutdown; stopping without final flush")
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Counters plus current queue depth"""
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if stopping:
+                # Final flush: pick up anything enqueued behind the stop marker
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        self._queue.task_done()
+                    else:
+                        batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            for attempt in range(2):
+                try:
+                    self._insert(batch)
+                    self._count('written', len(batch))
+                    self._count('batches')
+                    break
+                except Error as e:
+                    if attempt == 0:
+                        time.sleep(self.flush_interval)
+                        continue
+                    self._count('failed', len(batch))
+                    logger.error("Dropped %d audit events after write failure: %s; events=%r", len(batch), e, batch)
+                except Exception:
+                    # Anything else won't go away on retry; keep the thread alive
+                    self._count('failed', len(batch))
+                    logger.exception("Dropped %d audit events after unexpected error; events=%r", len(batch), batch)
+                    break
+        finally:
+            # flush() joins the queue, so every dequeued event must be marked done
+            for _ in batch:
+                self._queue.task_done()
+
+    @staticmethod
+    def _insert(events):
+        get_repository().insert_logs(events)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Return the process-wide audit writer, creating it on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter(
+                    config.AUDIT_QUEUE_SIZE,
+                    config.AUDIT_BATCH_SIZE,
+                    config.AUDIT_FLUSH_INTERVAL,
+                    config.AUDIT_ENQUEUE_TIMEOUT
+                )
+                atexit.register(_writer.shutdown)
+                instrumentation.register_collector('audit_writer', _writer.stats)
+    return _writer
@@ -0,0 +1,78 @@
+# Storage Backends
+# The data layer (db/repository.py) runs on a backend chosen with
+# DB_BACKEND: MySQL (default) or the embedded SQLite file in
+# db/sqlite_backend.py. A backend hands out connections with the
+# mysql.connector surface the app uses and names the SQL dialect module
+# (db/queries.py or db/sqlite_queries.py) statements are read from.
+import threading
+from contextlib import contextmanager
+from config import config
+import instrumentation
+from db import queries
+from db.db import ConnectionPool, bootstrap_schema, get_connection, get_pool, initialize_database
+from db.sqlite_backend import SQLiteBackend
+
+
+class MySQLBackend:
+    """MySQL through the process connection pool, or a private pool for `db_config`"""
+
+    name = 'mysql'
+    sql = queries
+
+    def __init__(self, db_config=None):
+        self.db_config = db_config
+        self._pool = ConnectionPool(db_config, config.DB_POOL_SIZE, config.DB_POOL_TIMEOUT) if db_config else None
+
+    def connection(self):
+        """Borrow a pooled connection; use as `with backend.connection() as connection:`"""
+        return self._pool.connection() if self._pool else get_connection()
+
+    def pool_stats(self):
+        """Connection pool usage (in use, waits, wait time)"""
+        return (self._pool or get_pool()).stats()
+
+    def initialize(self):
+        """Create the database and apply pending migrations once"""
+        if self.db_config is None:
+            return initialize_database()
+        bootstrap_schema(self.db_config)
+        return True
+
+    def first_insert_id(self, cursor, count):
+        """ID of the first row of the last multi-row INSERT"""
+        # MySQL reports the first AUTO_INCREMENT value of a multi-row insert
+        return cursor.lastrowid
+
+    @contextmanager
+    def try_lock(self, connection, name):
+        """Non-blocking named lock shared by every server process; yields whether it was acquired"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+        acquired = cursor.fetchone()[0] == 1 #type: ignore
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                cursor.fetchone()
+            cursor.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend selected by config.DB_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if config.DB_BACKEND == 'sqlite':
+                    _backend = SQLiteBackend(config.SQLITE_PATH)
+                else:
+                    _backend = MySQLBackend()
+    return _backend
+
+
+instrumentation.register_collector('db_pool', lambda: get_backend().pool_stats())
@@ -0,0 +1,284 @@
+# Incremental Parquet Backups
+#
+# A backup chain is one full snapshot followed by incrementals, recorded in
+# <BACKUP_DIR>/manifest.json. Incrementals carry only what changed since the
+# previous backup:
+#   logs      rows with log_id above the last high-water mark
+#   patients  rows whose updated_at is at or after the last snapshot time,
+#             minus BACKUP_OVERLAP_SECONDS: a transaction open during that
+#             snapshot stamps updated_at before it but commits after it.
+#             Re-read rows are harmless since restore upserts.
+#   deleted   deleted_patients tombstones above the last deletion_id
+# users is small and copied in full every time.
+#
+#   python -m db.backup full | incremental | list
+#   python -m db.backup restore --database hospital_restore [--upto ID] [--replace]
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+import mysql.connector
+from mysql.connector import FieldType
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import config
+from db import activity_rollup
+from db.db import bootstrap_schema, get_connection
+
+MANIFEST_NAME = "manifest.json"
+
+INTEGER_TYPES = {'TINY', 'SHORT', 'LONG', 'LONGLONG', 'INT24', 'YEAR'}
+FLOAT_TYPES = {'FLOAT', 'DOUBLE'}
+TIMESTAMP_TYPES = {'DATETIME', 'TIMESTAMP'}
+
+# Restore order matters: logs reference users
+TABLE_KEYS = {
+    'users': 'user_id',
+    'patients': 'patient_id',
+    'logs': 'log_id',
+}
+
+
+def load_manifest(backup_dir=None):
+    """Backup chain recorded in the manifest (empty list if none yet)"""
+    path = os.path.join(backup_dir or config.BACKUP_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['backups']
+
+
+def save_manifest(backups, backup_dir=None):
+    """Atomically rewrite the manifest"""
+    backup_dir = backup_dir or config.BACKUP_DIR
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'backups': backups}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_backup(kind="incremental", backup_dir=None, chunk_size=None, db_config=None):
+    """Write a full or incremental Parquet backup and append it to the manifest
+
+    An incremental with no earlier full backup in the manifest is taken as
+    a full one. `db_config` backs up another database instead of the pooled
+    one. Returns the new manifest entry.
+    """
+    backup_dir = backup_dir or config.BACKUP_DIR
+    chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+    os.makedirs(backup_dir, exist_ok=True)
+    backups = load_manifest(backup_dir)
+    previous = backups[-1] if backups else None
+    if previous is None:
+        kind = "full"
+
+    backup_id = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    entry = {'id': backup_id, 'type': kind, 'created_at': None, 'files': {}, 'rows': {}, 'watermarks': {}}
+
+    with (mysql.connector.connect(**db_config) if db_config else get_connection()) as connection:
+        # One consistent snapshot for every table and watermark
+        connection.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT NOW(),
+                   (SELECT COALESCE(MAX(log_id), 0) FROM logs),
+                   (SELECT COALESCE(MAX(deletion_id), 0) FROM deleted_patients)
+        """)
+        snapshot_time, max_log_id, max_deletion_id = cursor.fetchone() #type: ignore
+        cursor.close()
+        entry['created_at'] = snapshot_time.isoformat()
+
+        if kind == "full":
+            selections = {
+                'users': ("SELECT * FROM users", ()),
+                'patients': ("SELECT * FROM patients", ()),
+                'logs': ("SELECT * FROM logs WHERE log_id <= %s", (max_log_id,)),
+            }
+        else:
+            marks = previous['watermarks'] #type: ignore
+            patients_since = (datetime.fromisoformat(marks['patients_updated_at'])
+                              - timedelta(seconds=config.BACKUP_OVERLAP_SECONDS))
+            selections = {
+                'users': ("SELECT * FROM users", ()),
+                'patients': ("SELECT * FROM patients WHERE updated_at >= %s", (patients_since,)),
+                'logs': ("SELECT * FROM logs WHERE log_id > %s AND log_id <= %s", (marks['log_id'], max_log_id)),
+                'deleted_patients': (
+                    "SELECT * FROM deleted_patients WHERE deletion_id > %s AND deletion_id <= %s",
+                    (marks['deletion_id'], max_deletion_id)
+                ),
+            }
+
+        for table, (sql, params) in selections.items():
+            path = os.path.join(backup_dir, f"{backup_id}_{kind}_{table}.parquet")
+            rows = write_parquet(connection, sql, params, path, chunk_size)
+            entry['rows'][table] = rows
+            if rows:
+                entry['files'][table] = os.path.basename(path)
+        connection.commit()
+
+    entry['watermarks'] = {
+        'log_id': max_log_id,
+        'patients_updated_at': snapshot_time.isoformat(),
+        'deletion_id': max_deletion_id,
+    }
+    backups.append(entry)
+    save_manifest(backups, backup_dir)
+    return entry
+
+
+def write_parquet(connection, sql, params, path, chunk_size):
+    """Stream a query into a Parquet file chunk by chunk; returns the row count"""
+    cursor = connection.cursor(buffered=False)
+    cursor.execute(sql, params)
+    schema = _arrow_schema(cursor.description)
+    writer = None
+    rows = 0
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+        cursor.close()
+    return rows
+
+
+def _arrow_schema(description):
+    fields = []
+    for column in description:
+        name, type_code = column[0], column[1]
+        type_name = FieldType.get_info(type_code)
+        if type_name in INTEGER_TYPES:
+            arrow_type = pa.int64()
+        elif type_name in FLOAT_TYPES:
+            arrow_type = pa.float64()
+        elif type_name == 'DATE':
+            arrow_type = pa.date32()
+        elif type_name in TIMESTAMP_TYPES:
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def restore(db_config, backup_dir=None, upto=None, replace=False, chunk_size=None, progress=print):
+    """Rebuild users, patients and logs from the latest full backup plus its incrementals
+
+    Restores into `db_config['database']`, which must be empty unless
+    `replace` is set. `upto` stops after the backup with that id.
+    """
+    backup_dir = backup_dir or config.BACKUP_DIR
+    chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+    chain = _restore_chain(load_manifest(backup_dir), upto)
+
+    # Users come from the backup, so don't seed the defaults into the target
+    bootstrap_schema(db_config, seed_users=False)
+    connection = mysql.connector.connect(**db_config)
+    try:
+        cursor = connection.cursor()
+        if replace:
+            for table in reversed(list(TABLE_KEYS)):
+                cursor.execute(f"DELETE FROM {table}")
+            activity_rollup.lock_watermark(cursor)
+            activity_rollup.reset(cursor)
+        else:
+            for table in TABLE_KEYS:
+                cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+                if cursor.fetchall():
+                    raise ValueError(f"Target table {table} is not empty; pass replace=True to overwrite")
+
+        for entry in chain:
+            for table, key in TABLE_KEYS.items():
+                filename = entry['files'].get(table)
+                if filename:
+                    rows = _upsert_parquet(cursor, table, key, os.path.join(backup_dir, filename), chunk_size)
+                    connection.commit()
+                    progress(f"{entry['id']} ({entry['type']}): restored {rows:,} {table} rows")
+            filename = entry['files'].get('deleted_patients')
+            if filename:
+                deleted = 0
+                for batch in pq.ParquetFile(os.path.join(backup_dir, filename)).iter_batches(chunk_size, columns=['patient_id']):
+                    ids = batch.column(0).to_pylist()
+                    cursor.execute(
+                        f"DELETE FROM patients WHERE patient_id IN ({', '.join(['%s'] * len(ids))})",
+                        tuple(ids)
+                    )
+                    deleted += cursor.rowcount
+                connection.commit()
+                progress(f"{entry['id']} ({entry['type']}): replayed {deleted:,} patient deletions")
+
+        # Restored logs bypass the audit writer; fold them into the rollup
+        activity_rollup.roll_up(cursor, activity_rollup.lock_watermark(cursor))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+    return [entry['id'] for entry in chain]
+
+
+def _restore_chain(backups, upto=None):
+    if upto is not None:
+        ids = [entry['id'] for entry in backups]
+        if upto not in ids:
+            raise ValueError(f"No backup with id {upto}")
+        backups = backups[:ids.index(upto) + 1]
+    fulls = [i for i, entry in enumerate(backups) if entry['type'] == "full"]
+    if not fulls:
+        raise ValueError("No full backup to restore from")
+    return backups[fulls[-1]:]
+
+
+def _upsert_parquet(cursor, table, key, path, chunk_size):
+    parquet = pq.ParquetFile(path)
+    columns = parquet.schema_arrow.names
+    updates = ", ".join(f"{column} = VALUES({column})" for column in columns if column != key)
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+           f"ON DUPLICATE KEY UPDATE {updates}")
+    rows = 0
+    for batch in parquet.iter_batches(chunk_size):
+        values = list(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+        cursor.executemany(sql, values)
+        rows += len(values)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental Parquet backups of the hospital database")
+    parser.add_argument("--dir", default=None, help=f"backup directory (default {config.BACKUP_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("full", help="take a full snapshot (starts a new chain)")
+    commands.add_parser("incremental", help="back up changes since the last backup")
+    commands.add_parser("list", help="show the manifest")
+    restore_parser = commands.add_parser("restore", help="rebuild tables from the latest chain")
+    restore_parser.add_argument("--database", required=True, help="database to restore into")
+    restore_parser.add_argument("--upto", default=None, help="last backup id to apply")
+    restore_parser.add_argument("--replace", action="store_true", help="delete existing rows in the target first")
+    args = parser.parse_args(argv)
+
+    if args.command in ("full", "incremental"):
+        entry = run_backup(args.command, args.dir)
+        print(f"{entry['id']} ({entry['type']}): " + ", ".join(f"{table} {rows:,}" for table, rows in entry['rows'].items()))
+    elif args.command == "list":
+        for entry in load_manifest(args.dir):
+            print(f"{entry['id']}  {entry['type']:<11}  {entry['created_at']}  " +
+                  ", ".join(f"{table} {rows:,}" for table, rows in entry['rows'].items()))
+    else:
+        restore(dict(config.DB_CONFIG, database=args.database), args.dir, args.upto, args.replace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
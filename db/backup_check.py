@@ -0,0 +1,111 @@
+# Backup Round-Trip Check
+#
+# Seeds a scratch MySQL database, takes a full backup and two incrementals
+# into a temporary directory, restores the chain into a second, freshly
+# created database (without --replace) and exits non-zero when the
+# restored users, patients or logs differ from the source. One patient
+# update is stamped before the first incremental's snapshot but committed
+# after it, so it must be picked up by the second.
+#
+#   python -m db.backup_check [--database hospital_backup_check] [--patients 200] [--logs 1000]
+import argparse
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import mysql.connector
+import crypto_service
+from config import config
+from db.backend import MySQLBackend
+from db.backup import TABLE_KEYS, restore, run_backup
+from db.repository import Repository
+
+
+def seed(repository, patients, logs, offset=0):
+    """Add patients and log events through the repository"""
+    now = datetime.now().replace(microsecond=0)
+    for i in range(offset, offset + patients):
+        contact = f"555-{i:07d}"
+        repository.add_patient(f"Patient {i}", contact, f"Diagnosis {i % 7}", (now + timedelta(days=30)).date(),
+                               name_index=crypto_service.blind_index('name', f"Patient {i}"),
+                               contact_index=crypto_service.blind_index('contact', contact))
+    repository.insert_logs([
+        (1 + i % 3, "admin", "View Patients", now - timedelta(minutes=i), f"Check event {offset + i}")
+        for i in range(logs)
+    ])
+
+
+def table_rows(db_config, table, key):
+    """Every row of a table in primary-key order"""
+    connection = mysql.connector.connect(**db_config)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT * FROM {table} ORDER BY {key}")
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+    return rows
+
+
+def drop_database(db_config):
+    server = dict(db_config)
+    database = server.pop('database')
+    connection = mysql.connector.connect(**server)
+    connection.cursor().execute(f"DROP DATABASE IF EXISTS {database}")
+    connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up a scratch database and restore it into a fresh one")
+    parser.add_argument("--database", default="hospital_backup_check", help="scratch source database to recreate")
+    parser.add_argument("--patients", type=int, default=200, help="patients to seed")
+    parser.add_argument("--logs", type=int, default=1000, help="log events to seed")
+    args = parser.parse_args(argv)
+    config.DEMO_MODE = True  # scratch databases hold generated data only
+
+    source = dict(config.DB_CONFIG, database=args.database)
+    target = dict(config.DB_CONFIG, database=f"{args.database}_restore")
+    for db_config in (source, target):
+        drop_database(db_config)
+
+    repository = Repository(MySQLBackend(source))
+    repository.initialize()
+    with tempfile.TemporaryDirectory() as backup_dir:
+        seed(repository, args.patients, args.logs)
+        run_backup("full", backup_dir, db_config=source)
+        seed(repository, args.patients // 4, args.logs // 4, offset=args.patients)
+
+        # Update stamped before the snapshot, committed after it
+        straggler = mysql.connector.connect(**source)
+        straggler.start_transaction()
+        straggler.cursor().execute("UPDATE patients SET diagnosis = 'Committed late' WHERE patient_id = 1")
+        run_backup("incremental", backup_dir, db_config=source)
+        straggler.commit()
+        straggler.close()
+        run_backup("incremental", backup_dir, db_config=source)
+
+        # A fresh target: restore must not trip over seeded default users
+        try:
+            restore(target, backup_dir, progress=lambda message: None)
+        except ValueError as e:
+            print(f"FAIL  restore into a fresh database: {e}")
+            return 1
+
+    failures = 0
+    for table, key in TABLE_KEYS.items():
+        expected, restored = table_rows(source, table, key), table_rows(target, table, key)
+        if expected == restored:
+            print(f"ok    {table}: {len(restored):,} rows")
+        else:
+            failures += 1
+            print(f"FAIL  {table}: {len(expected):,} rows in source, {len(restored):,} restored")
+
+    if failures:
+        print(f"\n{failures} table(s) differ after restore")
+        return 1
+    print("\nRestored database matches the source")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
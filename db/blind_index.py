@@ -0,0 +1,79 @@
+# Blind Index Backfill
+#
+# Fills patients.name_index / contact_index (keyed HMACs, see
+# crypto_service.blind_index) for rows written before migration 0008, one
+# primary-key batch per short transaction. New patients get their indexes
+# on insert, so this runs once per database; --rebuild recomputes every
+# row after BLIND_INDEX_KEY changes. Indexes are computed from the
+# plaintext name/contact columns, so no row is decrypted.
+#
+#   python -m db.blind_index [--batch-size 5000] [--rebuild]
+import argparse
+import sys
+import time
+from mysql.connector import Error
+import crypto_service
+from config import config
+from db.backend import get_backend
+
+
+def backfill(batch_size=None, rebuild=False, progress_callback=None):
+    """Compute missing (or, with `rebuild`, all) blind indexes batch by batch; returns a summary dict"""
+    batch_size = batch_size or config.BLIND_INDEX_BATCH_SIZE
+    summary = {'updated': 0, 'batches': 0}
+    start = time.perf_counter()
+
+    backend = get_backend()
+    select = backend.sql.BLIND_INDEX_ALL if rebuild else backend.sql.BLIND_INDEX_MISSING
+    with backend.connection() as connection:
+        cursor = connection.cursor()
+        last_id = 0
+        while True:
+            cursor.execute(select, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            ids, names, contacts = zip(*rows) #type: ignore
+            cursor.executemany(backend.sql.SET_BLIND_INDEX, list(zip(
+                crypto_service.blind_index_many('name', names),
+                crypto_service.blind_index_many('contact', contacts),
+                ids
+            )))
+            connection.commit()
+            summary['updated'] += len(rows)
+            summary['batches'] += 1
+            last_id = ids[-1]
+
+            if progress_callback:
+                progress_callback(summary)
+            if len(rows) < batch_size:
+                break
+        cursor.close()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the name/contact blind index columns of existing patients")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"patients per transaction (default {config.BLIND_INDEX_BATCH_SIZE})")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every row (after changing BLIND_INDEX_KEY)")
+    args = parser.parse_args(argv)
+
+    if not crypto_service.blind_index_enabled():
+        print("BLIND_INDEX_KEY is not set; indexes made with the public default key can be brute-forced. "
+              "Set it in .env (or DEMO_MODE=1 for a demo) and run again.", file=sys.stderr)
+        return 1
+    try:
+        summary = backfill(
+            args.batch_size, args.rebuild,
+            progress_callback=lambda s: print(f"\r{s['updated']:,} patients indexed in {s['batches']:,} batches", end="")
+        )
+    except Error as e:
+        print(f"\nBlind index backfill failed: {e}", file=sys.stderr)
+        return 1
+    print(f"\nIndexed {summary['updated']:,} patients in {summary['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,92 +1,311 @@
 # Database Functions
-from copy import Error
+import os
+import re
+import threading
+import time
+from collections import deque
 import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
 import streamlit as st
 from config import config
 import hashlib
+import instrumentation
+
+
+class PooledConnection:
+    """Borrowed MySQL connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._connection is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return instrumentation.instrument_cursor(self._connection.cursor(*args, **kwargs))
+
+    def close(self):
+        """Return the connection to the pool instead of disconnecting"""
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """Process-wide pool of reusable MySQL connections"""
+
+    def __init__(self, db_config, size, timeout):
+        self.db_config = db_config
+        self.size = size
+        self.timeout = timeout
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def connection(self, timeout=None):
+        """Borrow a healthy connection, waiting up to `timeout` seconds for a free slot"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        wait_start = None
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                if wait_start is None:
+                    wait_start = time.monotonic()
+                    self._waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - wait_start
+                    raise PoolError(f"No free database connection after {timeout:.1f}s (pool size {self.size})")
+                self._cond.wait(remaining)
+            if wait_start is not None:
+                self._wait_time += time.monotonic() - wait_start
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._open += 1  # reserve the slot before connecting outside the lock
+            self._checkouts += 1
+
+        try:
+            if connection is not None and not self._is_healthy(connection):
+                self._close_quietly(connection)
+                with self._cond:
+                    self._discarded += 1
+                connection = None
+            if connection is None:
+                connection = mysql.connector.connect(**self.db_config)
+        except Error:
+            self._forget()
+            raise
+        instrumentation.record_connection(time.perf_counter() - started)
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Take a connection back, rolling back any transaction left open"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            self._close_quietly(connection)
+            with self._cond:
+                self._discarded += 1
+            self._forget()
+            return
+        with self._cond:
+            self._idle.append(connection)
+            self._cond.notify()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._open - len(self._idle),
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+            }
+
+    def close_all(self):
+        """Disconnect every idle connection"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def _forget(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            return connection.is_connected()
+        except Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(config.DB_CONFIG, config.DB_POOL_SIZE, config.DB_POOL_TIMEOUT)
+    return _pool
+
+
+def get_connection(timeout=None):
+    """Borrow a pooled connection; use as `with get_connection() as connection:`"""
+    return get_pool().connection(timeout)
 
 
 def create_connection():
-    """Create database connection with error handling"""
+    """Borrow a pooled database connection with error handling"""
     try:
-        connection = mysql.connector.connect(**config.DB_CONFIG)
-        if connection.is_connected():
-            return connection
+        return get_connection()
     except Error as e:
         st.error(f"Database connection error: {e}")
         return None
 
+
+def pool_stats():
+    """Connection pool usage (in use, waits, wait time)"""
+    return get_pool().stats()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_LOCK = "hospital_schema_migrations"
+
+DEFAULT_USERS = [
+    ('admin', hashlib.sha256('admin123'.encode()).hexdigest(), 'admin'),
+    ('dr_bob', hashlib.sha256('doc123'.encode()).hexdigest(), 'doctor'),
+    ('alice_recep', hashlib.sha256('rec123'.encode()).hexdigest(), 'receptionist')
+]
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def migration_files(directory=MIGRATIONS_DIR):
+    """Ordered (version, name, path) for every NNNN_name.sql script in a directory"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.match(r'^(\d+)_(\w+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def load_migrations():
+    """Ordered (version, name, statements) for every script in db/migrations"""
+    migrations = []
+    for version, name, path in migration_files():
+        with open(path, encoding='utf-8') as f:
+            sql = f.read()
+        migrations.append((version, name, split_sql(sql)))
+    return migrations
+
+
+def split_sql(sql):
+    """Split a migration script into statements, dropping `--` comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def apply_migrations(connection):
+    """Apply every migration newer than the recorded schema version"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_version")
+    applied = {row[0] for row in cursor.fetchall()} #type: ignore
+
+    for version, name, statements in load_migrations():
+        if version in applied:
+            continue
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+            (version, name)
+        )
+        connection.commit()
+    cursor.close()
+
+
 def initialize_database():
-    """Initialize database and create tables"""
+    """Bootstrap database and schema once per server process"""
+    global _schema_ready
+    if _schema_ready:
+        return True
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        try:
+            bootstrap_schema(config.DB_CONFIG)
+        except Error as e:
+            st.error(f"Database initialization error: {e}")
+            return False
+        _schema_ready = True
+        return True
+
+
+def bootstrap_schema(db_config, seed_users=True):
+    """Create the database, run pending migrations and seed default users
+
+    Pass `seed_users=False` for restore targets, whose users come from the backup.
+    """
+    # Connect without database first
+    temp_config = db_config.copy()
+    db_name = temp_config.pop('database')
+    connection = mysql.connector.connect(**temp_config)
     try:
-        # Connect without database first
-        temp_config = config.DB_CONFIG.copy()
-        db_name = temp_config.pop('database')
-        connection = mysql.connector.connect(**temp_config)
         cursor = connection.cursor()
-        
+
         # Create database if not exists
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
         cursor.execute(f"USE {db_name}")
-        
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                role ENUM('admin', 'doctor', 'receptionist') NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create patients table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS patients (
-                patient_id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(200) NOT NULL,
-                contact VARCHAR(50) NOT NULL,
-                diagnosis TEXT,
-                anonymized_name VARCHAR(50),
-                anonymized_contact VARCHAR(50),
-                encrypted_name TEXT,
-                encrypted_contact TEXT,
-                date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                data_retention_date DATE,
-                is_anonymized BOOLEAN DEFAULT FALSE
-            )
-        """)
-        
-        # Create logs table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                log_id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                role VARCHAR(50),
-                action VARCHAR(255),
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                details TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
-        """)
-        
-        # Insert default users if not exist
-        cursor.execute("SELECT COUNT(*) FROM users")
-        if cursor.fetchone()[0] == 0: #type: ignore
-            default_users = [
-                ('admin', hashlib.sha256('admin123'.encode()).hexdigest(), 'admin'),
-                ('dr_bob', hashlib.sha256('doc123'.encode()).hexdigest(), 'doctor'),
-                ('alice_recep', hashlib.sha256('rec123'.encode()).hexdigest(), 'receptionist')
-            ]
-            cursor.executemany(
-                "INSERT INTO users (username, password, role) VALUES (%s, %s, %s)",
-                default_users
-            )
-        
-        connection.commit()
+
+        # Serialise migrations across server processes sharing the database
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (MIGRATION_LOCK,))
+        if cursor.fetchone()[0] != 1: #type: ignore
+            raise Error("Timed out waiting for the schema migration lock")
+        try:
+            apply_migrations(connection)
+
+            # Insert default users if not exist
+            if seed_users:
+                cursor.execute("SELECT COUNT(*) FROM users")
+                if cursor.fetchone()[0] == 0: #type: ignore
+                    cursor.executemany(
+                        "INSERT INTO users (username, password, role) VALUES (%s, %s, %s)",
+                        DEFAULT_USERS
+                    )
+            connection.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
         cursor.close()
+    finally:
         connection.close()
-        return True
-    except Error as e:
-        st.error(f"Database initialization error: {e}")
-        return False
@@ -0,0 +1,168 @@
+# Query Plan Regression Check
+#
+# Seeds a scratch MySQL database, runs EXPLAIN on every hot production
+# query from db/queries.py and exits non-zero when one of them falls back
+# to a full table scan or a filesort that is not explicitly allowed.
+#
+#   python -m db.explain_check [--database hospital_plan_check] [--patients 20000] [--logs 50000]
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+import mysql.connector
+from config import config
+from db import activity_rollup, queries
+from db.db import bootstrap_schema
+
+FULL_SCAN = "full_scan"
+FILESORT = "filesort"
+
+_LAST_WEEK = datetime.now() - timedelta(days=7)
+_LAST_YEAR = (_LAST_WEEK - timedelta(days=358), datetime.now())
+
+# (name, sql, params, allowed problems)
+PLAN_CHECKS = [
+    ("logs_first_page", *queries.logs_page(), set()),
+    ("logs_older_page", *queries.logs_page(after=(_LAST_WEEK, 1000)), set()),
+    ("logs_newer_page", *queries.logs_page(before=(_LAST_WEEK, 1000)), set()),
+    ("logs_by_action", *queries.logs_page(action="Login", after=(_LAST_WEEK, 1000)), set()),
+    ("logs_by_user", *queries.logs_page(user_id=1, after=(_LAST_WEEK, 1000)), set()),
+    ("logs_by_date_range", *queries.logs_page(start=_LAST_WEEK - timedelta(days=1), end=_LAST_WEEK), set()),
+    # Live feed delta: the newest log_ids of the default 50,000 seeded, sorted in memory
+    ("logs_since", *queries.logs_page(since=49900), {FILESORT}),
+    ("logs_since_by_action", *queries.logs_page(action="Login", since=49900), {FILESORT}),
+    ("max_log_id", queries.MAX_LOG_ID, (), set()),
+    ("users", queries.USERS, (), set()),
+    ("log_actions", queries.LOG_ACTIONS, (), set()),
+    # Sorts the aggregated per-day/per-action groups of the small rollup table
+    ("daily_activity", queries.DAILY_ACTIVITY, _LAST_YEAR, {FILESORT}),
+    ("action_counts", queries.ACTION_COUNTS, _LAST_YEAR, {FILESORT}),
+    ("hourly_heatmap", queries.HOURLY_HEATMAP, (_LAST_WEEK, datetime.now()), set()),
+    ("overview_metrics", queries.OVERVIEW_METRICS, (), set()),
+    ("expired_patients", *queries.expired_patients_page(datetime.now().date()), set()),
+    ("expired_patients_next_page", *queries.expired_patients_page(datetime.now().date(), after=(_LAST_WEEK.date(), 1000)), set()),
+    ("expired_patient_ids", queries.EXPIRED_PATIENT_IDS, (datetime.now().date(), 1000), set()),
+    ("patients_admin_page", *queries.patients_page('admin', after=10000), set()),
+    ("patients_admin_newer_page", *queries.patients_page('admin', before=10000), set()),
+    ("patients_doctor_page", *queries.patients_page('doctor', after=10000), set()),
+    ("patients_receptionist_page", *queries.patients_page('receptionist'), set()),
+    ("recent_additions", queries.RECENT_ADDITIONS, (), set()),
+    # Ranking sorts the full-text matches by relevance
+    ("search_patients", *queries.search_patients('doctor', ['seeded']), {FILESORT}),
+    ("search_patient_id", *queries.search_patients('doctor', ['10000']), set()),
+    ("patients_by_contact", *queries.patients_by_contact('admin', "0" * 64), set()),
+    ("duplicate_patients", queries.DUPLICATE_PATIENTS, ("0" * 64, "0" * 64), set()),
+]
+
+LOG_ACTIONS = ["Login", "Logout", "Add Patient", "View Patients", "Anonymize Data", "GDPR Consent"]
+
+
+def explain_problems(cursor, sql, params=()):
+    """(problem, description) pairs found in the EXPLAIN output of a query"""
+    cursor.execute("EXPLAIN " + sql, params)
+    problems = []
+    for row in cursor.fetchall():
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            problems.append((FULL_SCAN, f"full scan of {row['table']}"))
+        if 'Using filesort' in extra:
+            problems.append((FILESORT, f"filesort on {row['table']}"))
+    return problems
+
+
+def seed(connection, patients, logs, batch_size=5000):
+    """Top the scratch tables up to the requested row counts with deterministic data"""
+    rng = random.Random(42)
+    now = datetime.now()
+    cursor = connection.cursor()
+
+    cursor.execute("SELECT COUNT(*) FROM patients")
+    existing = cursor.fetchone()[0] #type: ignore
+    rows = []
+    for i in range(existing, patients):
+        added = now - timedelta(days=rng.randint(0, 720))
+        retention = (added + timedelta(days=90)).date() if rng.random() < 0.05 else (now + timedelta(days=rng.randint(1, 90))).date()
+        rows.append((f"Patient {i}", f"555-{i:07d}", "Seeded diagnosis", added, retention, rng.random() < 0.5))
+        if len(rows) >= batch_size:
+            _insert_patients(cursor, rows)
+            connection.commit()
+            rows = []
+    if rows:
+        _insert_patients(cursor, rows)
+
+    cursor.execute("SELECT user_id, role FROM users")
+    users = cursor.fetchall()
+    cursor.execute("SELECT COUNT(*) FROM logs")
+    existing = cursor.fetchone()[0] #type: ignore
+    rows = []
+    for _ in range(existing, logs):
+        user_id, role = rng.choice(users)
+        timestamp = now - timedelta(seconds=rng.randint(0, 180 * 86400))
+        rows.append((user_id, role, rng.choice(LOG_ACTIONS), timestamp, "Seeded event"))
+        if len(rows) >= batch_size:
+            _insert_logs(cursor, rows)
+            connection.commit()
+            rows = []
+    if rows:
+        _insert_logs(cursor, rows)
+
+    activity_rollup.roll_up(cursor, activity_rollup.lock_watermark(cursor))
+    connection.commit()
+    cursor.execute("ANALYZE TABLE patients, logs, activity_rollup")
+    cursor.fetchall()
+    cursor.close()
+
+
+def _insert_patients(cursor, rows):
+    cursor.executemany(
+        """INSERT INTO patients (name, contact, diagnosis, date_added, data_retention_date, is_anonymized)
+           VALUES (%s, %s, %s, %s, %s, %s)""",
+        rows
+    )
+
+
+def _insert_logs(cursor, rows):
+    cursor.executemany(
+        "INSERT INTO logs (user_id, role, action, timestamp, details) VALUES (%s, %s, %s, %s, %s)",
+        rows
+    )
+
+
+def run_checks(connection):
+    """Run every plan check; returns a list of (name, description) failures"""
+    cursor = connection.cursor(dictionary=True)
+    failures = []
+    for name, sql, params, allowed in PLAN_CHECKS:
+        problems = [(kind, text) for kind, text in explain_problems(cursor, sql, params) if kind not in allowed]
+        status = "FAIL" if problems else "ok"
+        print(f"{status:4}  {name}" + "".join(f"\n      - {text}" for _, text in problems))
+        failures.extend((name, text) for _, text in problems)
+    cursor.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot production queries against a seeded scratch database")
+    parser.add_argument("--database", default="hospital_plan_check", help="scratch database to create and seed")
+    parser.add_argument("--patients", type=int, default=20000, help="patient rows to seed")
+    parser.add_argument("--logs", type=int, default=50000, help="log rows to seed")
+    args = parser.parse_args(argv)
+
+    db_config = dict(config.DB_CONFIG, database=args.database)
+    bootstrap_schema(db_config)
+    connection = mysql.connector.connect(**db_config)
+    try:
+        seed(connection, args.patients, args.logs)
+        failures = run_checks(connection)
+    finally:
+        connection.close()
+
+    if failures:
+        print(f"\n{len(failures)} plan regression(s) found")
+        return 1
+    print("\nAll query plans use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
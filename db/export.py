@@ -0,0 +1,62 @@
+# Streaming CSV Export
+import csv
+import gzip
+import io
+import os
+import tempfile
+from config import config
+from db.backend import get_backend
+
+
+def export_query_to_csv(sql, params=(), compress=False, chunk_size=None, prefix="export", extra_chunks=None):
+    """Stream a query's rows into a temporary CSV file; returns (path, row_count)
+
+    Rows are read from an unbuffered cursor `chunk_size` at a time and
+    written straight to disk, so memory stays O(chunk) regardless of the
+    table size. `extra_chunks` (lists of row tuples in the same columns,
+    e.g. archived logs) are appended after the query rows. The caller owns
+    the file and should remove it once served.
+    """
+    chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+    suffix = ".csv.gz" if compress else ".csv"
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=suffix, dir=config.EXPORT_DIR)
+    row_count = 0
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            out = gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
+            text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+
+            with get_backend().connection() as connection:
+                cursor = connection.cursor(buffered=False)
+                cursor.execute(sql, params)
+                writer.writerow(cursor.column_names)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    row_count += len(rows)
+                cursor.close()
+
+            for rows in extra_chunks or ():
+                writer.writerows(rows)
+                row_count += len(rows)
+
+            text.flush()
+            text.detach()
+            if compress:
+                out.close()
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, row_count
+
+
+def read_and_remove(path):
+    """Read a finished export file and delete it from disk"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,184 @@
+# Encryption Key Rotation
+#
+# Re-encrypts every patients.encrypted_name / encrypted_contact under the
+# first key of ENCRYPTION_KEYS, one patient_id range per transaction, with
+# the Fernet work spread across crypto_service's worker processes. Each
+# chunk commits together with its checkpoint in key_rotation, so a job
+# stopped by a crash or a restart resumes after the last finished chunk.
+# Reads stay correct throughout: the key ring decrypts with old and new
+# keys alike.
+#
+# To rotate: put the new key first in ENCRYPTION_KEYS (old keys after it),
+# restart the app servers so new values use it, run this job, and drop the
+# old keys once it reports finished.
+#
+#   python -m db.key_rotation [--chunk-size 20000] [--workers N] [--status]
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime
+from mysql.connector import Error
+import crypto_service
+from config import config
+from db.backend import get_backend
+from db.audit_writer import get_audit_writer
+
+ROTATION_LOCK = "hospital_key_rotation"
+
+
+def rotation_status(keys=None):
+    """Checkpoint of the rotation to the primary key (a dict), or None if it never started"""
+    keys = tuple(keys or config.ENCRYPTION_KEYS)
+    backend = get_backend()
+    with backend.connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(backend.sql.ROTATION_CHECKPOINT, (crypto_service.key_fingerprint(keys[0]),))
+        checkpoint = cursor.fetchone()
+        cursor.close()
+    return checkpoint
+
+
+def rotate_keys(user_id=None, role=None, chunk_size=None, keys=None, parallel=None, max_chunks=None,
+                progress_callback=None):
+    """Re-encrypt encrypted patient fields under the primary key from the last checkpoint; returns a summary dict
+
+    `keys` defaults to ENCRYPTION_KEYS, primary first. Patients added after
+    the rotation started already use the primary key and are skipped.
+    Tokens no key opens are left as they are and counted in
+    summary['failed']. Only one rotation runs at a time; a second caller
+    gets summary['skipped'] = True.
+    """
+    keys = tuple(keys or config.ENCRYPTION_KEYS)
+    chunk_size = chunk_size or config.KEY_ROTATION_CHUNK_SIZE
+    fingerprint = crypto_service.key_fingerprint(keys[0])
+    summary = {'key': fingerprint, 'rotated': 0, 'failed': 0, 'chunks': 0, 'skipped': False, 'finished': False}
+    start = time.perf_counter()
+
+    backend = get_backend()
+    sql = backend.sql
+    try:
+        with backend.connection() as connection, backend.try_lock(connection, ROTATION_LOCK) as acquired:
+            if not acquired:
+                summary['skipped'] = True
+                return summary
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(sql.ROTATION_CHECKPOINT, (fingerprint,))
+            checkpoint = cursor.fetchone()
+            if checkpoint is None:
+                cursor.execute(sql.START_ROTATION, (fingerprint, datetime.now()))
+                connection.commit()
+                cursor.execute(sql.ROTATION_CHECKPOINT, (fingerprint,))
+                checkpoint = cursor.fetchone()
+            lower, last_id = checkpoint['last_patient_id'], checkpoint['max_patient_id'] #type: ignore
+            summary.update(resumed_from=lower, max_patient_id=last_id, finished=checkpoint['finished_at'] is not None) #type: ignore
+
+            while not summary['finished'] and (max_chunks is None or summary['chunks'] < max_chunks):
+                if lower >= last_id:
+                    cursor.execute(sql.FINISH_ROTATION, (datetime.now(), fingerprint))
+                    connection.commit()
+                    summary['finished'] = True
+                    break
+                upper = min(lower + chunk_size, last_id)
+                cursor.execute(sql.ROTATION_CHUNK, (lower, upper))
+                rows = cursor.fetchall()
+                tokens = [row['encrypted_name'] for row in rows] + [row['encrypted_contact'] for row in rows] #type: ignore
+                rotated = crypto_service.rotate_many(tokens, keys, parallel)
+
+                updates, failed = [], 0
+                for i, row in enumerate(rows):
+                    fields = []
+                    for old, new in ((row['encrypted_name'], rotated[i]), (row['encrypted_contact'], rotated[len(rows) + i])): #type: ignore
+                        if new is None and old is not None:
+                            failed += 1  # keep what no key opens rather than losing it
+                            new = old
+                        fields.append(new)
+                    updates.append((*fields, row['patient_id'])) #type: ignore
+                if updates:
+                    cursor.executemany(sql.SET_ENCRYPTED_FIELDS, updates)
+                cursor.execute(sql.SAVE_ROTATION_CHECKPOINT, (upper, len(rows), failed, fingerprint))
+                connection.commit()
+
+                summary['rotated'] += len(rows)
+                summary['failed'] += failed
+                summary['chunks'] += 1
+                summary['last_patient_id'] = lower = upper
+                if progress_callback:
+                    progress_callback(summary)
+            cursor.close()
+    finally:
+        # Committed chunks are audited even if a later chunk failed
+        summary['seconds'] = time.perf_counter() - start
+        if summary['chunks']:
+            details = (f"Re-encrypted {summary['rotated']} patient records under key {fingerprint} "
+                       f"in {summary['chunks']} chunks over {summary['seconds']:.1f}s")
+            if summary['failed']:
+                details += f"; {summary['failed']} fields no key could open"
+            if summary['finished']:
+                details += "; rotation finished"
+            get_audit_writer().submit((user_id, role, "Key Rotation", datetime.now(), details))
+    return summary
+
+
+def _rotate_and_report(user_id, role):
+    try:
+        rotate_keys(user_id, role)
+    except Error as e:
+        get_audit_writer().submit((user_id, role, "Key Rotation", datetime.now(), f"Key rotation stopped: {e}"))
+
+
+def rotate_in_background(user_id=None, role=None):
+    """Start (or resume) the rotation on a daemon thread of this server process; returns the thread"""
+    thread = threading.Thread(target=_rotate_and_report, args=(user_id, role), name="key-rotation", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-encrypt patient fields under the primary key of ENCRYPTION_KEYS")
+    parser.add_argument("--chunk-size", type=int, default=None, help=f"patient_id range per transaction (default {config.KEY_ROTATION_CHUNK_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default CRYPTO_WORKERS or one per CPU)")
+    parser.add_argument("--max-chunks", type=int, default=None, help="stop after this many chunks (resume later)")
+    parser.add_argument("--user-id", type=int, default=None, help="user recorded in the audit log")
+    parser.add_argument("--role", default="admin", help="role recorded in the audit log")
+    parser.add_argument("--status", action="store_true", help="print the checkpoint and exit")
+    args = parser.parse_args(argv)
+
+    fingerprint = crypto_service.key_fingerprint(config.ENCRYPTION_KEYS[0])
+    if args.status:
+        checkpoint = rotation_status()
+        if checkpoint is None:
+            print(f"No rotation to key {fingerprint} yet")
+        else:
+            state = f"finished {checkpoint['finished_at']}" if checkpoint['finished_at'] else "in progress"
+            print(f"Rotation to key {fingerprint}: {state}, through patient_id {checkpoint['last_patient_id']:,} "
+                  f"of {checkpoint['max_patient_id']:,}; {checkpoint['rotated']:,} rotated, {checkpoint['failed']:,} failed")
+        return 0
+
+    if args.workers:
+        config.CRYPTO_WORKERS = args.workers
+    try:
+        summary = rotate_keys(
+            args.user_id, args.role, args.chunk_size, max_chunks=args.max_chunks,
+            progress_callback=lambda s: print(f"\rthrough patient_id {s['last_patient_id']:,} of {s['max_patient_id']:,}: "
+                                              f"{s['rotated']:,} rotated", end="")
+        )
+    except Error as e:
+        print(f"\nKey rotation failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        get_audit_writer().flush()
+    if summary['skipped']:
+        print("Another key rotation is already running")
+        return 0
+    print(f"\nRe-encrypted {summary['rotated']:,} patients under key {fingerprint} in {summary['seconds']:.1f}s"
+          f" (resumed after patient_id {summary['resumed_from']:,})")
+    if summary['failed']:
+        print(f"{summary['failed']:,} fields could not be opened by any key and were left unchanged")
+    print("Rotation finished; keys after the first can be removed from ENCRYPTION_KEYS" if summary['finished']
+          else "Stopped before the end; run again to resume")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+# Audit Log Partitions and Archive
+#
+# logs is RANGE-partitioned by month on UNIX_TIMESTAMP(timestamp) (migration
+# 0006). maintain() keeps LOG_PARTITIONS_AHEAD empty future months ready and
+# moves months older than LOG_HOT_MONTHS out of MySQL:
+#   1. EXCHANGE PARTITION swaps the month into an empty staging table
+#      (metadata only; the hot table never runs a large DELETE)
+#   2. the staging table is streamed, newest first, into an append-only
+#      zstd Parquet segment in LOG_ARCHIVE_DIR and recorded in segments.json
+#   3. the staging table and the emptied partition are dropped
+# An interrupted run is finished by the next one from the staging table.
+# merge_archive() and iter_archive() apply the same filters and keyset
+# cursors as queries.logs_page, so audit pages and exports span hot and
+# archived rows.
+#
+#   python -m db.log_archive maintain [--keep-months 3] | partitions | segments
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from config import config
+from db import queries
+from db.backend import get_backend
+from db.db import get_connection
+
+# pyarrow (and db.backup, which needs it) is imported inside the functions
+# that read or write segments: the repository imports this module on the
+# login path, and most reads find no archived segments at all.
+
+SEGMENTS_NAME = "segments.json"
+STAGE_PREFIX = "logs_stage_"
+LOG_COLUMNS = ['log_id', 'user_id', 'username', 'role', 'action', 'timestamp', 'details']
+
+PARTITIONS_SQL = """
+    SELECT partition_name,
+           IF(partition_description = 'MAXVALUE', NULL, FROM_UNIXTIME(partition_description)),
+           table_rows
+    FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = 'logs' AND partition_name IS NOT NULL
+    ORDER BY partition_ordinal_position
+"""
+
+
+def load_segments(archive_dir=None):
+    """Archived segments recorded in segments.json (empty list if none yet)"""
+    path = os.path.join(archive_dir or config.LOG_ARCHIVE_DIR, SEGMENTS_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['segments']
+
+
+def save_segments(segments, archive_dir=None):
+    """Atomically rewrite segments.json"""
+    archive_dir = archive_dir or config.LOG_ARCHIVE_DIR
+    path = os.path.join(archive_dir, SEGMENTS_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'segments': segments}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    return datetime(value.year + month // 12, month % 12 + 1, 1)
+
+
+def list_partitions(cursor):
+    """(name, exclusive upper bound or None for p_future, approximate rows) per partition"""
+    cursor.execute(PARTITIONS_SQL)
+    return cursor.fetchall()
+
+
+def ensure_partitions(cursor, months_ahead=None):
+    """Split p_future so every month up to `months_ahead` has its own partition
+
+    Returns the number of partitions added. The first run after migration
+    0006 starts from the oldest logged month and copies existing rows once;
+    afterwards p_future is empty and the split is metadata only.
+    """
+    months_ahead = config.LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    partitions = list_partitions(cursor)
+    if not partitions:
+        raise ValueError("logs is not partitioned; apply migration 0006 first")
+    bounds = [upper for _, upper, _ in partitions if upper is not None]
+    if bounds:
+        next_start = bounds[-1]
+    else:
+        cursor.execute("SELECT MIN(timestamp) FROM logs")
+        oldest = cursor.fetchone()[0] #type: ignore
+        next_start = _month_start(oldest or datetime.now())
+
+    target = _add_months(_month_start(datetime.now()), months_ahead + 1)
+    definitions = []
+    while next_start < target:
+        upper = _add_months(next_start, 1)
+        definitions.append(
+            f"PARTITION p{next_start:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d %H:%M:%S}'))"
+        )
+        next_start = upper
+    if definitions:
+        cursor.execute(
+            f"ALTER TABLE logs REORGANIZE PARTITION p_future INTO ("
+            f"{', '.join(definitions)}, PARTITION p_future VALUES LESS THAN MAXVALUE)"
+        )
+    return len(definitions)
+
+
+def archive_partitions(connection, keep_months=None, archive_dir=None, chunk_size=None, progress=print):
+    """Move whole months older than `keep_months` into archive segments; returns rows archived"""
+    keep_months = config.LOG_HOT_MONTHS if keep_months is None else keep_months
+    archive_dir = archive_dir or config.LOG_ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = _add_months(_month_start(datetime.now()), -keep_months)
+    cursor = connection.cursor()
+    archived = 0
+
+    # Finish anything an interrupted run left behind
+    cursor.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name LIKE %s",
+        (STAGE_PREFIX + "%",)
+    )
+    for (stage,) in cursor.fetchall():
+        archived += _archive_stage(connection, stage, archive_dir, chunk_size, progress)
+
+    for name, upper, _ in list_partitions(cursor):
+        if upper is None or upper > cutoff:
+            continue
+        stage = STAGE_PREFIX + name
+        cursor.execute(f"CREATE TABLE {stage} LIKE logs")
+        cursor.execute(f"ALTER TABLE {stage} REMOVE PARTITIONING")
+        cursor.execute(f"ALTER TABLE logs EXCHANGE PARTITION {name} WITH TABLE {stage}")
+        archived += _archive_stage(connection, stage, archive_dir, chunk_size, progress)
+
+        # A row that landed after the exchange keeps the partition for the next run
+        cursor.execute(f"SELECT COUNT(*) FROM logs PARTITION ({name})")
+        if cursor.fetchone()[0] == 0: #type: ignore
+            cursor.execute(f"ALTER TABLE logs DROP PARTITION {name}")
+            progress(f"Dropped partition {name}")
+    cursor.close()
+    return archived
+
+
+def _archive_stage(connection, stage, archive_dir, chunk_size, progress):
+    """Write a staging table to a segment (once) and drop it; returns its row count"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*), MIN(log_id), MAX(log_id), MIN(timestamp), MAX(timestamp) FROM {stage}")
+    rows, min_id, max_id, min_ts, max_ts = cursor.fetchone() #type: ignore
+    partition = stage[len(STAGE_PREFIX):]
+
+    if rows:
+        from db.backup import write_parquet
+        filename = f"logs_{partition}_{min_id}_{max_id}.parquet"
+        segments = load_segments(archive_dir)
+        if filename not in {segment['file'] for segment in segments}:
+            path = os.path.join(archive_dir, filename)
+            written = write_parquet(
+                connection, f"SELECT * FROM {stage} ORDER BY timestamp DESC, log_id DESC", (),
+                path + ".tmp", chunk_size or config.EXPORT_CHUNK_SIZE
+            )
+            if written != rows:
+                os.remove(path + ".tmp")
+                raise ValueError(f"Archived {written} of {rows} rows from {stage}; staging table kept")
+            os.replace(path + ".tmp", path)
+            segments.append({
+                'file': filename,
+                'partition': partition,
+                'rows': rows,
+                'min_log_id': min_id,
+                'max_log_id': max_id,
+                'min_timestamp': min_ts.isoformat(),
+                'max_timestamp': max_ts.isoformat(),
+                'archived_at': datetime.now().isoformat(),
+            })
+            save_segments(segments, archive_dir)
+            progress(f"Archived {rows:,} rows from {partition} to {filename}")
+
+    cursor.execute(f"DROP TABLE {stage}")
+    cursor.close()
+    return rows
+
+
+def maintain(keep_months=None, months_ahead=None, archive_dir=None, progress=print):
+    """Add upcoming monthly partitions and archive old ones; returns a summary dict"""
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        added = ensure_partitions(cursor, months_ahead)
+        cursor.close()
+        archived = archive_partitions(connection, keep_months, archive_dir, progress=progress)
+    return {'partitions_added': added, 'rows_archived': archived}
+
+
+def _filter(action=None, user_id=None, start=None, end=None, after=None, before=None):
+    """pyarrow expression matching queries.logs_page's WHERE clause"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    timestamp, log_id = ds.field('timestamp'), ds.field('log_id')
+    stamp = lambda value: pa.scalar(value, type=pa.timestamp('us'))
+    conditions = []
+    if action:
+        conditions.append(ds.field('action') == action)
+    if user_id is not None:
+        conditions.append(ds.field('user_id') == user_id)
+    if start:
+        conditions.append(timestamp >= stamp(start))
+    if end:
+        conditions.append(timestamp < stamp(end))
+    if after:
+        conditions.append((timestamp < stamp(after[0])) | ((timestamp == stamp(after[0])) & (log_id < after[1])))
+    elif before:
+        conditions.append((timestamp > stamp(before[0])) | ((timestamp == stamp(before[0])) & (log_id > before[1])))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _candidate_segments(segments, start=None, end=None, after=None, before=None):
+    """Segments whose timestamp span can hold matching rows"""
+    for segment in segments:
+        low = datetime.fromisoformat(segment['min_timestamp'])
+        high = datetime.fromisoformat(segment['max_timestamp'])
+        if (start and high < start) or (end and low >= end):
+            continue
+        if (after and low > after[0]) or (before and high < before[0]):
+            continue
+        yield segment, low, high
+
+
+def _with_usernames(table, usernames):
+    """Segment rows as logs_page rows (already filtered to known users)"""
+    rows = []
+    for row in table.to_pylist():
+        row['username'] = usernames[row['user_id']]
+        rows.append({column: row[column] for column in LOG_COLUMNS})
+    return rows
+
+
+def _known_users(expression, usernames):
+    """Like logs_page's JOIN users, skip rows without a known user"""
+    import pyarrow.dataset as ds
+    known = ds.field('user_id').isin(list(usernames))
+    return known if expression is None else expression & known
+
+
+def _usernames():
+    with get_backend().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(queries.USERS)
+        usernames = dict(cursor.fetchall()) #type: ignore
+        cursor.close()
+    return usernames
+
+
+def merge_archive(rows, action=None, user_id=None, start=None, end=None, limit=100,
+                  after=None, before=None, archive_dir=None):
+    """Merge archived rows into a logs_page result, keeping its order and limit
+
+    `rows` is the hot page exactly as queried (newest first, or oldest
+    first for a `before` page). Segments are read only while they could
+    still place a row inside the page.
+    """
+    segments = load_segments(archive_dir)
+    if not segments:
+        return rows
+    import pyarrow.dataset as ds
+    archive_dir = archive_dir or config.LOG_ARCHIVE_DIR
+    ascending = bool(before and not after)
+    order = 'ascending' if ascending else 'descending'
+    sort_key = lambda row: (row['timestamp'], row['log_id'])
+    candidates = sorted(
+        _candidate_segments(segments, start, end, after, before),
+        key=lambda item: item[1] if ascending else item[2], reverse=not ascending
+    )
+    usernames = expression = None
+    for segment, low, high in candidates:
+        if limit is not None and len(rows) >= limit:
+            boundary = rows[limit - 1]['timestamp']
+            if (low > boundary) if ascending else (high < boundary):
+                break
+        if usernames is None:
+            usernames = _usernames()
+            expression = _known_users(_filter(action, user_id, start, end, after, before), usernames)
+        table = ds.dataset(os.path.join(archive_dir, segment['file'])).to_table(filter=expression)
+        table = table.sort_by([('timestamp', order), ('log_id', order)])
+        if limit is not None:
+            table = table.slice(0, limit)
+        rows = sorted(rows + _with_usernames(table, usernames), key=sort_key, reverse=not ascending)
+        if limit is not None:
+            rows = rows[:limit]
+    return rows
+
+
+def iter_archive(action=None, user_id=None, start=None, end=None, chunk_size=None, archive_dir=None):
+    """Yield archived rows matching the filters as lists of LOG_COLUMNS tuples, newest segment first"""
+    segments = load_segments(archive_dir)
+    if not segments:
+        return
+    import pyarrow.dataset as ds
+    archive_dir = archive_dir or config.LOG_ARCHIVE_DIR
+    usernames = _usernames()
+    expression = _known_users(_filter(action, user_id, start, end), usernames)
+    candidates = sorted(_candidate_segments(segments, start, end), key=lambda item: item[2], reverse=True)
+    for segment, _, _ in candidates:
+        scanner = ds.dataset(os.path.join(archive_dir, segment['file'])).scanner(
+            filter=expression, batch_size=chunk_size or config.EXPORT_CHUNK_SIZE, use_threads=False
+        )
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield [tuple(row[column] for column in LOG_COLUMNS) for row in _with_usernames(batch, usernames)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain monthly audit log partitions and the cold archive")
+    parser.add_argument("--dir", default=None, help=f"archive directory (default {config.LOG_ARCHIVE_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    maintain_parser = commands.add_parser("maintain", help="add future partitions and archive old months")
+    maintain_parser.add_argument("--keep-months", type=int, default=None, help=f"months kept hot (default {config.LOG_HOT_MONTHS})")
+    maintain_parser.add_argument("--months-ahead", type=int, default=None, help=f"future partitions (default {config.LOG_PARTITIONS_AHEAD})")
+    commands.add_parser("partitions", help="list the partitions of logs")
+    commands.add_parser("segments", help="list archived segments")
+    args = parser.parse_args(argv)
+
+    if args.command == "maintain":
+        summary = maintain(args.keep_months, args.months_ahead, args.dir)
+        print(f"Added {summary['partitions_added']} partition(s); archived {summary['rows_archived']:,} rows")
+    elif args.command == "partitions":
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            for name, upper, rows in list_partitions(cursor):
+                print(f"{name:<10}  < {upper or 'MAXVALUE'}  ~{rows:,} rows")
+            cursor.close()
+    else:
+        for segment in load_segments(args.dir):
+            print(f"{segment['file']}  {segment['rows']:,} rows  "
+                  f"{segment['min_timestamp']} .. {segment['max_timestamp']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+-- 0002: secondary indexes for the hot dashboard queries
+-- (checked by `python -m db.explain_check`)
+
+CREATE INDEX idx_logs_timestamp ON logs (timestamp);
+CREATE INDEX idx_logs_action ON logs (action);
+
+CREATE INDEX idx_patients_is_anonymized ON patients (is_anonymized);
+CREATE INDEX idx_patients_retention_date ON patients (data_retention_date);
+CREATE INDEX idx_patients_date_added ON patients (date_added);
@@ -0,0 +1,9 @@
+-- 0003: composite indexes for filtered, keyset-paginated audit log pages
+-- InnoDB appends log_id to each secondary index, so both serve
+-- ORDER BY timestamp, log_id after the equality filter.
+
+CREATE INDEX idx_logs_action_timestamp ON logs (action, timestamp);
+CREATE INDEX idx_logs_user_timestamp ON logs (user_id, timestamp);
+
+-- The (action, timestamp) prefix covers GROUP BY action
+DROP INDEX idx_logs_action ON logs;
@@ -0,0 +1,16 @@
+-- 0004: change markers for incremental backups
+-- patients.updated_at marks inserted/updated rows; deleted_patients keeps a
+-- tombstone per deleted patient so restores replay retention deletes.
+
+ALTER TABLE patients
+    ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD INDEX idx_patients_updated_at (updated_at);
+
+CREATE TABLE IF NOT EXISTS deleted_patients (
+    deletion_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    patient_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER trg_patients_after_delete AFTER DELETE ON patients
+FOR EACH ROW INSERT INTO deleted_patients (patient_id) VALUES (OLD.patient_id);
@@ -0,0 +1,25 @@
+-- 0005: hourly activity rollup for analytics
+-- Maintained from a log_id watermark by the audit writer (same transaction
+-- as each log batch); backfilled here once from existing logs.
+
+CREATE TABLE IF NOT EXISTS activity_rollup (
+    hour_bucket DATETIME NOT NULL,
+    action VARCHAR(255) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    event_count INT NOT NULL,
+    PRIMARY KEY (hour_bucket, action, role)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_watermark (
+    name VARCHAR(50) PRIMARY KEY,
+    last_log_id BIGINT NOT NULL
+);
+
+INSERT INTO rollup_watermark (name, last_log_id)
+SELECT 'activity_rollup', COALESCE(MAX(log_id), 0) FROM logs;
+
+INSERT INTO activity_rollup (hour_bucket, action, role, event_count)
+SELECT TIMESTAMP(DATE(timestamp), MAKETIME(HOUR(timestamp), 0, 0)), COALESCE(action, ''), COALESCE(role, ''), COUNT(*)
+FROM logs
+WHERE log_id <= (SELECT last_log_id FROM rollup_watermark WHERE name = 'activity_rollup')
+GROUP BY 1, 2, 3;
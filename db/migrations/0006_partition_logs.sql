@@ -0,0 +1,20 @@
+-- 0006: partition logs by month so old months can be archived and dropped
+-- as metadata operations (see db/log_archive.py).
+-- MySQL partitioned tables cannot have foreign keys, and every unique key
+-- must include the partition column: the user_id FK goes (users are never
+-- deleted; audit queries JOIN users anyway) and the primary key becomes
+-- (log_id, timestamp). AUTO_INCREMENT still keeps log_id unique.
+
+ALTER TABLE logs DROP FOREIGN KEY logs_ibfk_1;
+
+UPDATE logs SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL;
+
+ALTER TABLE logs
+    MODIFY timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (log_id, timestamp);
+
+-- One catch-all partition; python -m db.log_archive maintain splits it into months
+ALTER TABLE logs PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
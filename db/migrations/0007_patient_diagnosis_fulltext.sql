@@ -0,0 +1,4 @@
+-- 0007: full-text index for patient search on diagnosis text
+-- The first FULLTEXT index on an InnoDB table rebuilds the table once.
+
+ALTER TABLE patients ADD FULLTEXT INDEX ft_patients_diagnosis (diagnosis);
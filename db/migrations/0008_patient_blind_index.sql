@@ -0,0 +1,11 @@
+-- 0008: blind indexes for exact lookups on encrypted name and contact
+-- HMAC-SHA256 (hex) of the normalized value under BLIND_INDEX_KEY (see
+-- crypto_service.blind_index). New patients get them on insert; existing
+-- rows are filled by `python -m db.blind_index`, since the key never
+-- reaches the database.
+
+ALTER TABLE patients
+    ADD COLUMN name_index CHAR(64) NULL AFTER encrypted_contact,
+    ADD COLUMN contact_index CHAR(64) NULL AFTER name_index,
+    ADD INDEX idx_patients_name_index (name_index),
+    ADD INDEX idx_patients_contact_index (contact_index);
@@ -0,0 +1,14 @@
+-- 0009: checkpoints for encryption key rotation (db/key_rotation.py)
+-- One row per target key, by fingerprint. last_patient_id is committed in
+-- the same transaction as each re-encrypted chunk, so a job restarted
+-- after a crash resumes right after the last finished chunk.
+
+CREATE TABLE IF NOT EXISTS key_rotation (
+    key_fingerprint CHAR(12) PRIMARY KEY,
+    last_patient_id INT NOT NULL DEFAULT 0,
+    max_patient_id INT NOT NULL DEFAULT 0,
+    rotated BIGINT NOT NULL DEFAULT 0,
+    failed BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL
+);
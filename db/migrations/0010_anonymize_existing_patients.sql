@@ -0,0 +1,11 @@
+-- 0010: one-time backfill for anonymize-on-write
+-- New patients get anonymized_name / anonymized_contact in the transaction
+-- that inserts them (Repository.add_patient, bulk import), so only rows
+-- added before this migration can still be pending. Same expressions as
+-- queries.ANON_NAME_SQL / ANON_CONTACT_SQL.
+
+UPDATE patients
+SET anonymized_name = CONCAT('ANON_', LPAD(patient_id, GREATEST(CHAR_LENGTH(patient_id), 4), '0')),
+    anonymized_contact = CASE WHEN CHAR_LENGTH(contact) >= 4 THEN CONCAT('XXX-XXX-', RIGHT(contact, 4)) ELSE 'XXX-XXX-XXXX' END,
+    is_anonymized = TRUE
+WHERE is_anonymized = FALSE;
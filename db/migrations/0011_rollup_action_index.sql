@@ -0,0 +1,4 @@
+-- 0011: distinct audit log actions for the Audit Logs action filter
+-- A loose index scan reads one entry per action instead of the whole rollup.
+
+CREATE INDEX idx_rollup_action ON activity_rollup (action);
@@ -0,0 +1,79 @@
+-- SQLite 0001: the schema of MySQL migrations 0001-0006 for the embedded
+-- backend: same tables, columns and indexes. logs is not partitioned and
+-- has no user FK, as on MySQL. Timestamps default to local time, as MySQL
+-- TIMESTAMP columns do in the session time zone.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL CHECK (role IN ('admin', 'doctor', 'receptionist')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(200) NOT NULL,
+    contact VARCHAR(50) NOT NULL,
+    diagnosis TEXT,
+    anonymized_name VARCHAR(50),
+    anonymized_contact VARCHAR(50),
+    encrypted_name TEXT,
+    encrypted_contact TEXT,
+    date_added TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    data_retention_date DATE,
+    is_anonymized BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_patients_is_anonymized ON patients (is_anonymized);
+CREATE INDEX IF NOT EXISTS idx_patients_retention_date ON patients (data_retention_date);
+CREATE INDEX IF NOT EXISTS idx_patients_date_added ON patients (date_added);
+CREATE INDEX IF NOT EXISTS idx_patients_updated_at ON patients (updated_at);
+
+-- MySQL's ON UPDATE CURRENT_TIMESTAMP
+CREATE TRIGGER IF NOT EXISTS trg_patients_updated_at AFTER UPDATE ON patients
+FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE patients SET updated_at = datetime('now', 'localtime') WHERE patient_id = NEW.patient_id;
+END;
+
+CREATE TABLE IF NOT EXISTS logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    role VARCHAR(50),
+    action VARCHAR(255),
+    timestamp TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    details TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_action_timestamp ON logs (action, timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_user_timestamp ON logs (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS deleted_patients (
+    deletion_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_after_delete AFTER DELETE ON patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO deleted_patients (patient_id) VALUES (OLD.patient_id);
+END;
+
+CREATE TABLE IF NOT EXISTS activity_rollup (
+    hour_bucket DATETIME NOT NULL,
+    action VARCHAR(255) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    event_count INT NOT NULL,
+    PRIMARY KEY (hour_bucket, action, role)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_watermark (
+    name VARCHAR(50) PRIMARY KEY,
+    last_log_id BIGINT NOT NULL
+);
+
+INSERT OR IGNORE INTO rollup_watermark (name, last_log_id) VALUES ('activity_rollup', 0);
@@ -0,0 +1,29 @@
+-- 0002: FTS5 index for patient search on diagnosis text (MySQL 0007)
+-- External-content table over patients, kept in sync by triggers.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+    diagnosis,
+    content='patients',
+    content_rowid='patient_id'
+);
+
+INSERT INTO patients_fts (patients_fts) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_insert AFTER INSERT ON patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO patients_fts (rowid, diagnosis) VALUES (NEW.patient_id, NEW.diagnosis);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_update AFTER UPDATE OF diagnosis ON patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, diagnosis) VALUES ('delete', OLD.patient_id, OLD.diagnosis);
+    INSERT INTO patients_fts (rowid, diagnosis) VALUES (NEW.patient_id, NEW.diagnosis);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_delete AFTER DELETE ON patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, diagnosis) VALUES ('delete', OLD.patient_id, OLD.diagnosis);
+END;
@@ -0,0 +1,8 @@
+-- 0003: blind indexes for exact lookups on encrypted name and contact (MySQL 0008)
+-- Filled on insert and by `python -m db.blind_index`.
+
+ALTER TABLE patients ADD COLUMN name_index CHAR(64);
+ALTER TABLE patients ADD COLUMN contact_index CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_patients_name_index ON patients (name_index);
+CREATE INDEX IF NOT EXISTS idx_patients_contact_index ON patients (contact_index);
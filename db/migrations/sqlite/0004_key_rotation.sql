@@ -0,0 +1,11 @@
+-- 0004: checkpoints for encryption key rotation (MySQL 0009)
+
+CREATE TABLE IF NOT EXISTS key_rotation (
+    key_fingerprint CHAR(12) PRIMARY KEY,
+    last_patient_id INT NOT NULL DEFAULT 0,
+    max_patient_id INT NOT NULL DEFAULT 0,
+    rotated BIGINT NOT NULL DEFAULT 0,
+    failed BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL
+);
@@ -0,0 +1,7 @@
+-- 0005: one-time backfill for anonymize-on-write (MySQL 0010)
+
+UPDATE patients
+SET anonymized_name = 'ANON_' || printf('%04d', patient_id),
+    anonymized_contact = CASE WHEN LENGTH(contact) >= 4 THEN 'XXX-XXX-' || SUBSTR(contact, -4) ELSE 'XXX-XXX-XXXX' END,
+    is_anonymized = TRUE
+WHERE is_anonymized = FALSE;
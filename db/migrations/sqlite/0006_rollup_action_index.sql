@@ -0,0 +1,3 @@
+-- 0006: distinct audit log actions for the Audit Logs action filter (MySQL 0011)
+
+CREATE INDEX IF NOT EXISTS idx_rollup_action ON activity_rollup (action);
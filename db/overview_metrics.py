@@ -0,0 +1,41 @@
+# Overview Metrics Provider
+# All overview counters from one query, cached process-wide for a short TTL
+# and shared by every session. Write paths call invalidate() so their own
+# changes show up on the next render.
+import threading
+import time
+from config import config
+from db.repository import get_repository
+
+_cached = None
+_expires_at = 0.0
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_overview_metrics():
+    """Counters dict (total_patients, anonymized_patients, today_activities, expired_records)"""
+    global _cached, _expires_at
+    if _cached is not None and time.monotonic() < _expires_at:
+        return _cached
+    with _lock:
+        # Another session may have refreshed while we waited
+        if _cached is not None and time.monotonic() < _expires_at:
+            return _cached
+        generation = _generation
+        metrics = _fetch()
+        if generation == _generation:
+            _cached = metrics
+            _expires_at = time.monotonic() + config.OVERVIEW_CACHE_TTL
+        return metrics
+
+
+def invalidate():
+    """Drop the cached counters after a write that changes them"""
+    global _cached, _generation
+    _generation += 1
+    _cached = None
+
+
+def _fetch():
+    return get_repository().overview_metrics()
@@ -0,0 +1,174 @@
+# Storage Backend Parity Check
+#
+# Seeds identical deterministic data through the repository into a scratch
+# MySQL database and a temporary SQLite file, runs every repository read on
+# both and exits non-zero when any result differs. Run it after changing a
+# query in db/queries.py or db/sqlite_queries.py.
+#
+#   python -m db.parity_check [--database hospital_parity_check] [--patients 500] [--logs 3000]
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import mysql.connector
+import crypto_service
+from config import config
+from db.backend import MySQLBackend
+from db.repository import Repository
+from db.sqlite_backend import SQLiteBackend
+
+LOG_ACTIONS = ["Login", "Logout", "Add Patient", "View Patients", "Anonymize Data", "GDPR Consent"]
+
+# Set by each engine's clock at insert time, so never equal across backends
+VOLATILE_COLUMNS = {'date_added', 'updated_at'}
+
+
+def seed(repository, patients, logs, now):
+    """Write the same patients and log events through the repository"""
+    rng = random.Random(42)
+    for i in range(patients):
+        retention = (now + timedelta(days=rng.randint(-30, 90))).date()
+        contact = f"555-{i:07d}" if rng.random() < 0.9 else str(i % 100)
+        repository.add_patient(f"Patient {i}", contact, f"Diagnosis {i % 7}", retention,
+                               name_index=crypto_service.blind_index('name', f"Patient {i}"),
+                               contact_index=crypto_service.blind_index('contact', contact))
+    repository.import_patients([
+        (f"Imported {i}", f"777-{i:04d}", "Imported", None, None,
+         crypto_service.blind_index('name', f"Imported {i}"), crypto_service.blind_index('contact', f"777-{i:04d}"),
+         f"XXX-XXX-{i:04d}", (now + timedelta(days=30)).date())
+        for i in range(25)
+    ])
+
+    users = [1, 2, 3, None]
+    events = []
+    for i in range(logs):
+        user_id = rng.choice(users)
+        role = {1: 'admin', 2: 'doctor', 3: 'receptionist'}.get(user_id) #type: ignore
+        # Whole seconds, like MySQL TIMESTAMP columns
+        timestamp = now - timedelta(seconds=rng.randint(0, 400 * 86400))
+        events.append((user_id, role, rng.choice(LOG_ACTIONS), timestamp, f"Event {i}"))
+        if len(events) >= 500:
+            repository.insert_logs(events)
+            events = []
+    if events:
+        repository.insert_logs(events)
+    # Ties on timestamp exercise the log_id tie-breaker
+    repository.insert_logs([(1, 'admin', "Login", now - timedelta(hours=1), f"Tie {i}") for i in range(7)])
+
+
+def checks(repository, now):
+    """(name, callable) for every repository read, given the seeded data"""
+    today = now.replace(hour=0, minute=0, second=0)
+    tomorrow = today + timedelta(days=1)
+    first_page = repository.logs_page(limit=50)
+    cursor = (first_page[-1]['timestamp'], first_page[-1]['log_id']) if first_page else (now, 0)
+    expired = repository.expired_patients(today.date(), limit=20)
+    expired_cursor = (expired[-1]['data_retention_date'], expired[-1]['patient_id']) if expired else None
+    admin_hash = hashlib.sha256('admin123'.encode()).hexdigest()
+    result = [
+        ("authenticate", lambda: repository.authenticate('admin', admin_hash)),
+        ("authenticate_wrong_password", lambda: repository.authenticate('admin', 'x')),
+        ("users", repository.users),
+        ("log_actions", repository.log_actions),
+        ("logs_first_page", lambda: repository.logs_page(limit=50)),
+        ("logs_older_page", lambda: repository.logs_page(limit=50, after=cursor)),
+        ("logs_newer_page", lambda: repository.logs_page(limit=50, before=cursor)),
+        ("logs_by_action", lambda: repository.logs_page(action="Login", limit=50)),
+        ("logs_by_user", lambda: repository.logs_page(user_id=2, limit=50, after=cursor)),
+        ("logs_by_date_range", lambda: repository.logs_page(start=today - timedelta(days=30), end=today - timedelta(days=29), limit=None)),
+        ("max_log_id", repository.max_log_id),
+        ("logs_since", lambda: repository.logs_since(repository.max_log_id() - 20, limit=50)),
+        ("logs_since_by_action", lambda: repository.logs_since(repository.max_log_id() - 200, action="Login", limit=50)),
+        ("activity_last_7_days", lambda: repository.activity_stats(today - timedelta(days=6), tomorrow)),
+        ("activity_last_year", lambda: repository.activity_stats(today - timedelta(days=364), tomorrow)),
+        ("overview_metrics", repository.overview_metrics),
+        ("expired_patients", lambda: repository.expired_patients(today.date(), limit=20)),
+        ("expired_patients_next_page", lambda: repository.expired_patients(today.date(), limit=20, after=expired_cursor)),
+        ("encrypted_count", repository.encrypted_count),
+        ("search_by_id", lambda: repository.search_patients('doctor', '6')),
+        ("patients_by_contact", lambda: repository.patients_by_contact('admin', crypto_service.blind_index('contact', "555-0000012"))),
+        ("duplicate_patients", lambda: repository.duplicate_patients(crypto_service.blind_index('name', "Patient 3"), crypto_service.blind_index('contact', "3"))),
+        # Relevance scores differ by engine (InnoDB vs bm25); compare the matches
+        ("search_diagnosis_matches", lambda: sorted(p['patient_id'] for p in repository.search_patients('doctor', 'diagnosis', limit=None))),
+    ]
+    for view in ('admin', 'admin_anonymized', 'doctor', 'receptionist'):
+        result.append((f"patients_{view}_first_page", lambda view=view: repository.patients_page(view, limit=20)))
+        result.append((f"patients_{view}_older_page", lambda view=view: repository.patients_page(view, limit=20, after=200)))
+        result.append((f"patients_{view}_newer_page", lambda view=view: repository.patients_page(view, limit=20, before=200)))
+    return result
+
+
+def normalize(value):
+    """Compare values the way the app uses them: dates as typed ISO text, numbers as int
+
+    The type prefix keeps a date returned as a plain string from passing.
+    """
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items() if key not in VOLATILE_COLUMNS}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, (datetime, date)):
+        return f"{type(value).__name__}:{value.isoformat()}"
+    if isinstance(value, (Decimal, bool)):
+        return int(value)
+    return value
+
+
+def run_checks(repositories, now):
+    """Run every check on each repository; returns the names of checks that differ"""
+    failures = []
+    results = {name: checks(repository, now) for name, repository in repositories.items()}
+    names = [name for name, _ in next(iter(results.values()))]
+    for index, check_name in enumerate(names):
+        outputs = {backend: normalize(checks_[index][1]()) for backend, checks_ in results.items()}
+        values = list(outputs.values())
+        same = all(value == values[0] for value in values[1:])
+        rows = len(values[0]) if isinstance(values[0], list) else 1
+        print(f"{'ok' if same else 'FAIL':4}  {check_name} ({rows} rows)")
+        if not same:
+            for backend, value in outputs.items():
+                print(f"      {backend}: {str(value)[:300]}")
+            failures.append(check_name)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every repository query on MySQL and SQLite and compare the results")
+    parser.add_argument("--database", default="hospital_parity_check", help="scratch MySQL database to recreate")
+    parser.add_argument("--patients", type=int, default=500, help="patients to seed")
+    parser.add_argument("--logs", type=int, default=3000, help="log events to seed")
+    args = parser.parse_args(argv)
+    config.DEMO_MODE = True  # scratch databases hold generated data only
+
+    db_config = dict(config.DB_CONFIG, database=args.database)
+    server = dict(db_config)
+    server.pop('database')
+    connection = mysql.connector.connect(**server)
+    connection.cursor().execute(f"DROP DATABASE IF EXISTS {args.database}")
+    connection.close()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        archive_dir = os.path.join(scratch, "archive")
+        repositories = {
+            'mysql': Repository(MySQLBackend(db_config), archive_dir),
+            'sqlite': Repository(SQLiteBackend(os.path.join(scratch, "parity.db")), archive_dir),
+        }
+        now = datetime.now().replace(microsecond=0)
+        for repository in repositories.values():
+            repository.initialize()
+            seed(repository, args.patients, args.logs, now)
+        failures = run_checks(repositories, now)
+
+    if failures:
+        print(f"\n{len(failures)} check(s) differ between backends")
+        return 1
+    print("\nMySQL and SQLite return identical results")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+# Hot-path SQL
+# Shared by the data functions and db/explain_check.py so the plan
+# regression check always EXPLAINs exactly what production runs.
+# This is the MySQL dialect; db/sqlite_queries.py redefines the statements
+# that use MySQL-only syntax.
+import re
+
+def logs_page(action=None, user_id=None, start=None, end=None, limit=100, after=None, before=None, since=None):
+    """Keyset-paginated audit log query; returns (sql, params)
+
+    Rows come newest first, ordered by (timestamp, log_id). `after` and
+    `before` are (timestamp, log_id) cursors: `after` pages to older rows,
+    `before` to newer ones (returned oldest first; the caller reverses).
+    `since` keeps only rows with a higher log_id (live feed deltas, a
+    primary key range). `end` is exclusive; `limit=None` returns every
+    matching row (exports).
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("l.log_id > %s")
+        params.append(since)
+    if action:
+        conditions.append("l.action = %s")
+        params.append(action)
+    if user_id is not None:
+        conditions.append("l.user_id = %s")
+        params.append(user_id)
+    if start:
+        conditions.append("l.timestamp >= %s")
+        params.append(start)
+    if end:
+        conditions.append("l.timestamp < %s")
+        params.append(end)
+    if after:
+        conditions.append("(l.timestamp < %s OR (l.timestamp = %s AND l.log_id < %s))")
+        params.extend([after[0], after[0], after[1]])
+    elif before:
+        conditions.append("(l.timestamp > %s OR (l.timestamp = %s AND l.log_id > %s))")
+        params.extend([before[0], before[0], before[1]])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "ASC" if before and not after else "DESC"
+    sql = f"""
+        SELECT l.log_id, l.user_id, u.username, l.role, l.action, 
+               l.timestamp, l.details
+        FROM logs l
+        JOIN users u ON l.user_id = u.user_id
+        {where}
+        ORDER BY l.timestamp {order}, l.log_id {order}
+    """
+    if limit is not None:
+        sql += "LIMIT %s"
+        params.append(limit)
+    return sql, tuple(params)
+
+USERS = "SELECT user_id, username FROM users ORDER BY username"
+
+# Every action ever logged, for the audit log filter; the rollup keeps
+# actions of archived months too ('' stands for a NULL action)
+LOG_ACTIONS = "SELECT DISTINCT action FROM activity_rollup WHERE action <> '' ORDER BY action"
+
+AUTHENTICATE = "SELECT user_id, username, role FROM users WHERE username = %s AND password = %s"
+
+# Live feed watermark; log writers hold the rollup watermark lock, so
+# log_ids become visible in increasing order and `log_id > N` skips nothing
+MAX_LOG_ID = "SELECT COALESCE(MAX(log_id), 0) as max_log_id FROM logs"
+
+INSERT_LOGS = "INSERT INTO logs (user_id, role, action, timestamp, details) VALUES (%s, %s, %s, %s, %s)"
+
+# Activity rollup maintenance (db/activity_rollup.py)
+LOCK_WATERMARK = "SELECT last_log_id FROM rollup_watermark WHERE name = %s FOR UPDATE"
+
+ROLL_UP_ACTIVITY = """
+    INSERT INTO activity_rollup (hour_bucket, action, role, event_count)
+    SELECT TIMESTAMP(DATE(timestamp), MAKETIME(HOUR(timestamp), 0, 0)),
+           COALESCE(action, ''), COALESCE(role, ''), COUNT(*)
+    FROM logs
+    WHERE log_id > %s AND log_id <= %s
+    GROUP BY 1, 2, 3
+    ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count)
+"""
+
+# Archived segments counted in Python (activity_rollup.roll_up_archive)
+ADD_ACTIVITY_COUNTS = """
+    INSERT INTO activity_rollup (hour_bucket, action, role, event_count)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count)
+"""
+
+# Analytics read the hourly activity_rollup (db/activity_rollup.py), never
+# logs; each takes (start, end) datetimes with end exclusive
+DAILY_ACTIVITY = """
+    SELECT DATE(hour_bucket) as date, CAST(SUM(event_count) AS UNSIGNED) as count
+    FROM activity_rollup
+    WHERE hour_bucket >= %s AND hour_bucket < %s
+    GROUP BY DATE(hour_bucket)
+    ORDER BY date
+"""
+
+ACTION_COUNTS = """
+    SELECT action, CAST(SUM(event_count) AS UNSIGNED) as count
+    FROM activity_rollup
+    WHERE hour_bucket >= %s AND hour_bucket < %s
+    GROUP BY action
+    ORDER BY count DESC
+"""
+
+HOURLY_HEATMAP = """
+    SELECT DATE(hour_bucket) as date, HOUR(hour_bucket) as hour, CAST(SUM(event_count) AS UNSIGNED) as count
+    FROM activity_rollup
+    WHERE hour_bucket >= %s AND hour_bucket < %s
+    GROUP BY DATE(hour_bucket), HOUR(hour_bucket)
+"""
+
+# Every overview counter in one round trip; each subquery is index-only
+OVERVIEW_METRICS = """
+    SELECT
+        (SELECT COUNT(*) FROM patients) as total_patients,
+        (SELECT COUNT(*) FROM patients WHERE is_anonymized = TRUE) as anonymized_patients,
+        (SELECT COUNT(*) FROM logs
+         WHERE timestamp >= CURDATE() AND timestamp < CURDATE() + INTERVAL 1 DAY) as today_activities,
+        (SELECT COUNT(*) FROM patients WHERE data_retention_date < CURDATE()) as expired_records
+"""
+
+def expired_patients_page(today, limit=50, after=None):
+    """Keyset-paginated patients past their retention date; returns (sql, params)
+
+    Rows come oldest retention date first, ordered by (data_retention_date,
+    patient_id) as stored in idx_patients_retention_date. `after` is the
+    (data_retention_date, patient_id) cursor of the last row shown.
+    """
+    conditions, params = ["data_retention_date < %s"], [today]
+    if after:
+        conditions.append("(data_retention_date > %s OR (data_retention_date = %s AND patient_id > %s))")
+        params.extend([after[0], after[0], after[1]])
+    sql = f"""
+        SELECT patient_id, name, data_retention_date
+        FROM patients
+        WHERE {' AND '.join(conditions)}
+        ORDER BY data_retention_date, patient_id
+        LIMIT %s
+    """
+    return sql, tuple(params + [limit])
+
+# Next batch for the retention purge; served from idx_patients_retention_date
+EXPIRED_PATIENT_IDS = """
+    SELECT patient_id
+    FROM patients
+    WHERE data_retention_date < %s
+    LIMIT %s
+"""
+
+# Columns each patient view displays; nothing else leaves the database
+PATIENT_VIEWS = {
+    'admin': "patient_id, name, contact, diagnosis, date_added, data_retention_date",
+    'admin_anonymized': "patient_id, anonymized_name as name, anonymized_contact as contact, diagnosis, date_added",
+    'doctor': "patient_id, anonymized_name as name, anonymized_contact as contact, diagnosis, date_added",
+    'receptionist': "patient_id, date_added",
+}
+
+def patients_page(view, limit=50, after=None, before=None):
+    """Keyset-paginated patient listing for a view in PATIENT_VIEWS; returns (sql, params)
+
+    Rows come newest patient_id first. `after` pages to lower IDs, `before`
+    to higher ones (returned ascending; the caller reverses). `limit=None`
+    returns every row (exports).
+    """
+    conditions, params = [], []
+    if view == 'doctor':
+        conditions.append("is_anonymized = TRUE")
+    if after is not None:
+        conditions.append("patient_id < %s")
+        params.append(after)
+    elif before is not None:
+        conditions.append("patient_id > %s")
+        params.append(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "ASC" if before is not None and after is None else "DESC"
+    sql = f"""
+        SELECT {PATIENT_VIEWS[view]}
+        FROM patients
+        {where}
+        ORDER BY patient_id {order}
+    """
+    if limit is not None:
+        sql += "LIMIT %s"
+        params.append(limit)
+    return sql, tuple(params)
+
+# Search box input: a whole number looks up that patient_id; otherwise every
+# word of 3+ characters must prefix-match a word of the diagnosis (shorter
+# words fall under InnoDB's default innodb_ft_min_token_size)
+SEARCH_MIN_WORD = 3
+
+def search_terms(text):
+    """Words a search box query matches on, without operators or punctuation"""
+    words = re.findall(r"\w+", text or "")
+    if len(words) == 1 and words[0].isdigit():
+        return words
+    return [word for word in words if len(word) >= SEARCH_MIN_WORD and not word.isdigit()]
+
+def search_patients(view, terms, limit=50, offset=0):
+    """Ranked patient search for a view in PATIENT_VIEWS; returns (sql, params)
+
+    `terms` come from search_terms. Rows come best match first with a
+    `relevance` column, paginated by LIMIT/OFFSET (relevance has no stable
+    keyset); `limit=None` returns every match.
+    """
+    doctor = " AND is_anonymized = TRUE" if view == 'doctor' else ""
+    if len(terms) == 1 and terms[0].isdigit():
+        return f"SELECT {PATIENT_VIEWS[view]}, 1 AS relevance FROM patients WHERE patient_id = %s{doctor}", (int(terms[0]),)
+    match = "MATCH(diagnosis) AGAINST (%s IN BOOLEAN MODE)"
+    query = " ".join(f"+{term}*" for term in terms)
+    sql = f"""
+        SELECT {PATIENT_VIEWS[view]}, {match} AS relevance
+        FROM patients
+        WHERE {match}{doctor}
+        ORDER BY relevance DESC, patient_id DESC
+    """
+    params = [query, query]
+    if limit is not None:
+        sql += "LIMIT %s OFFSET %s"
+        params += [limit, offset]
+    return sql, tuple(params)
+
+# Search box input that is a phone number rather than words or an ID:
+# 7+ digits written with separators, or 10+ bare digits (shorter bare
+# numbers are patient IDs)
+CONTACT_CHARACTERS = re.compile(r"\+?[\d\s().-]+")
+
+def is_contact_query(text):
+    """True when a search box query should look up a contact number"""
+    text = (text or "").strip()
+    if not CONTACT_CHARACTERS.fullmatch(text):
+        return False
+    digits = sum(character.isdigit() for character in text)
+    return digits >= 10 or (digits >= 7 and not text.isdigit())
+
+# Exact lookups on the blind index columns (crypto_service.blind_index
+# values), served from idx_patients_contact_index
+def patients_by_contact(view, contact_index, limit=50, offset=0):
+    """Patients with a contact number, newest first, shaped like search_patients; returns (sql, params)"""
+    doctor = " AND is_anonymized = TRUE" if view == 'doctor' else ""
+    sql = f"""
+        SELECT {PATIENT_VIEWS[view]}, 1 AS relevance
+        FROM patients
+        WHERE contact_index = %s{doctor}
+        ORDER BY patient_id DESC
+    """
+    params = [contact_index]
+    if limit is not None:
+        sql += "LIMIT %s OFFSET %s"
+        params += [limit, offset]
+    return sql, tuple(params)
+
+# Intake duplicate check: (name_index, contact_index) -> patients sharing
+# the contact number, same name first
+DUPLICATE_PATIENTS = """
+    SELECT patient_id, date_added, name_index = %s AS same_name
+    FROM patients
+    WHERE contact_index = %s
+    ORDER BY same_name DESC, patient_id DESC
+    LIMIT 10
+"""
+
+# Blind index backfill (db/blind_index.py), one primary-key batch at a time
+BLIND_INDEX_MISSING = """
+    SELECT patient_id, name, contact
+    FROM patients
+    WHERE patient_id > %s AND (name_index IS NULL OR contact_index IS NULL)
+    ORDER BY patient_id
+    LIMIT %s
+"""
+
+BLIND_INDEX_ALL = """
+    SELECT patient_id, name, contact
+    FROM patients
+    WHERE patient_id > %s
+    ORDER BY patient_id
+    LIMIT %s
+"""
+
+SET_BLIND_INDEX = "UPDATE patients SET name_index = %s, contact_index = %s WHERE patient_id = %s"
+
+# Encryption key rotation (db/key_rotation.py); checkpoints are keyed by
+# the fingerprint of the key being rotated to
+ROTATION_CHECKPOINT = """
+    SELECT key_fingerprint, last_patient_id, max_patient_id, rotated, failed, started_at, finished_at
+    FROM key_rotation
+    WHERE key_fingerprint = %s
+"""
+
+START_ROTATION = """
+    INSERT INTO key_rotation (key_fingerprint, last_patient_id, max_patient_id, rotated, failed, started_at)
+    SELECT %s, 0, COALESCE(MAX(patient_id), 0), 0, 0, %s FROM patients
+"""
+
+SAVE_ROTATION_CHECKPOINT = """
+    UPDATE key_rotation SET last_patient_id = %s, rotated = rotated + %s, failed = failed + %s
+    WHERE key_fingerprint = %s
+"""
+
+FINISH_ROTATION = "UPDATE key_rotation SET finished_at = %s WHERE key_fingerprint = %s"
+
+ROTATION_CHUNK = """
+    SELECT patient_id, encrypted_name, encrypted_contact
+    FROM patients
+    WHERE patient_id > %s AND patient_id <= %s
+      AND (encrypted_name IS NOT NULL OR encrypted_contact IS NOT NULL)
+"""
+
+SET_ENCRYPTED_FIELDS = "UPDATE patients SET encrypted_name = %s, encrypted_contact = %s WHERE patient_id = %s"
+
+# SQL equivalents of anonymize_name / anonymize_contact for set-based updates
+ANON_NAME_SQL = "CONCAT('ANON_', LPAD(patient_id, GREATEST(CHAR_LENGTH(patient_id), 4), '0'))"
+ANON_CONTACT_SQL = ("CASE WHEN CHAR_LENGTH(contact) >= 4 THEN CONCAT('XXX-XXX-', RIGHT(contact, 4)) "
+                    "ELSE 'XXX-XXX-XXXX' END")
+
+RECENT_ADDITIONS = """
+    SELECT patient_id, date_added 
+    FROM patients 
+    ORDER BY date_added DESC, patient_id DESC
+    LIMIT 10
+"""
+
+ENCRYPTED_COUNT = "SELECT COUNT(*) as count FROM patients WHERE encrypted_name IS NOT NULL"
+
+INSERT_PATIENT = """
+    INSERT INTO patients (name, contact, diagnosis, encrypted_name, encrypted_contact,
+                          name_index, contact_index, data_retention_date, is_anonymized)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, FALSE)
+"""
+
+INSERT_IMPORTED_PATIENTS = """
+    INSERT INTO patients (name, contact, diagnosis, encrypted_name, encrypted_contact,
+                          name_index, contact_index, anonymized_contact, data_retention_date, is_anonymized)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE)
+"""
+
+# Run right after INSERT_PATIENT, in the same transaction, so a patient is
+# never visible without its anonymized fields
+ANONYMIZE_PATIENT = f"""
+    UPDATE patients SET anonymized_name = {ANON_NAME_SQL}, anonymized_contact = {ANON_CONTACT_SQL},
+                        is_anonymized = TRUE
+    WHERE patient_id = %s
+"""
+
+# Rows from an import batch have IDs >= its first ID and no anonymized_name
+# yet. A concurrent single insert in that range gets the same deterministic
+# values, which is harmless.
+ANONYMIZE_NAMES_FROM = f"""
+    UPDATE patients SET anonymized_name = {ANON_NAME_SQL}, is_anonymized = TRUE
+    WHERE patient_id >= %s AND anonymized_name IS NULL
+"""
+
+BACKUP_PATIENTS = "SELECT * FROM patients"
+
+BACKUP_LOGS = "SELECT * FROM logs"
@@ -0,0 +1,225 @@
+# Data Access Layer
+# Every data function of the app goes through Repository, which runs the
+# statements of its backend's SQL dialect (see db/backend.py). Methods raise
+# the backend's Error; callers keep their own error handling.
+import threading
+from db import activity_rollup, log_archive
+from db.backend import get_backend
+
+
+class Repository:
+    """Patients, users and audit log reads/writes on one storage backend"""
+
+    def __init__(self, backend, archive_dir=None):
+        self.backend = backend
+        self.sql = backend.sql
+        self.archive_dir = archive_dir
+
+    def initialize(self):
+        """Create or migrate the schema once per process; False on failure"""
+        return self.backend.initialize()
+
+    def _fetchall(self, sql, params=(), dictionary=True):
+        with self.backend.connection() as connection:
+            cursor = connection.cursor(dictionary=dictionary)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+
+    def _fetchone(self, sql, params=(), dictionary=True):
+        with self.backend.connection() as connection:
+            cursor = connection.cursor(dictionary=dictionary)
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            cursor.close()
+        return row
+
+    def _execute(self, sql, params=()):
+        with self.backend.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            rowcount = cursor.rowcount
+            connection.commit()
+            cursor.close()
+        return rowcount
+
+    # Users
+
+    def authenticate(self, username, password_hash):
+        """User row for matching credentials, or None"""
+        return self._fetchone(self.sql.AUTHENTICATE, (username, password_hash))
+
+    def users(self):
+        """User IDs and usernames, by username"""
+        return self._fetchall(self.sql.USERS)
+
+    # Patients
+
+    def add_patient(self, name, contact, diagnosis, retention_date, encrypted_name=None, encrypted_contact=None,
+                    name_index=None, contact_index=None):
+        """Insert one patient with its anonymized fields in one transaction; returns its patient_id"""
+        with self.backend.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                self.sql.INSERT_PATIENT,
+                (name, contact, diagnosis, encrypted_name, encrypted_contact, name_index, contact_index, retention_date)
+            )
+            patient_id = cursor.lastrowid
+            # ANON_#### needs the new patient_id
+            cursor.execute(self.sql.ANONYMIZE_PATIENT, (patient_id,))
+            connection.commit()
+            cursor.close()
+        return patient_id
+
+    def import_patients(self, rows):
+        """Insert a batch of validated import rows and fill their anonymized names
+        in one transaction; returns the batch's first patient_id"""
+        with self.backend.connection() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(self.sql.INSERT_IMPORTED_PATIENTS, rows)
+            first_id = self.backend.first_insert_id(cursor, len(rows))
+            cursor.execute(self.sql.ANONYMIZE_NAMES_FROM, (first_id,))
+            connection.commit()
+            cursor.close()
+        return first_id
+
+    def patients_page(self, view, limit=50, after=None, before=None):
+        """One keyset page of a patient view (see queries.patients_page), newest first"""
+        sql, params = self.sql.patients_page(view, limit, after, before)
+        patients = self._fetchall(sql, params)
+        if before is not None and after is None:
+            patients.reverse()
+        return patients
+
+    def search_patients(self, view, text, limit=50, offset=0):
+        """One page of patients matching a search box query, best match first; [] without search terms"""
+        terms = self.sql.search_terms(text)
+        if not terms:
+            return []
+        sql, params = self.sql.search_patients(view, terms, limit, offset)
+        return self._fetchall(sql, params)
+
+    def patients_by_contact(self, view, contact_index, limit=50, offset=0):
+        """One page of patients whose contact has this blind index, newest first"""
+        sql, params = self.sql.patients_by_contact(view, contact_index, limit, offset)
+        return self._fetchall(sql, params)
+
+    def duplicate_patients(self, name_index, contact_index):
+        """Patients sharing a contact blind index, with a same_name flag, same name first"""
+        return self._fetchall(self.sql.DUPLICATE_PATIENTS, (name_index, contact_index))
+
+    def expired_patients(self, today, limit=50, after=None):
+        """One keyset page of patients past their retention date (see queries.expired_patients_page)"""
+        sql, params = self.sql.expired_patients_page(today, limit, after)
+        return self._fetchall(sql, params)
+
+    def recent_additions(self):
+        """The ten most recently added patients"""
+        return self._fetchall(self.sql.RECENT_ADDITIONS)
+
+    def encrypted_count(self):
+        """Number of patients with encrypted identity fields"""
+        return self._fetchone(self.sql.ENCRYPTED_COUNT)['count'] #type: ignore
+
+    def overview_metrics(self):
+        """Every overview counter in one round trip"""
+        return self._fetchone(self.sql.OVERVIEW_METRICS)
+
+    # Audit log
+
+    def insert_logs(self, events):
+        """Insert (user_id, role, action, timestamp, details) events and fold them into the rollup"""
+        # The watermark lock serialises log writers, so the rollup never
+        # skips a log_id that another transaction has yet to commit
+        with self.backend.connection() as connection:
+            cursor = connection.cursor()
+            last_log_id = activity_rollup.lock_watermark(cursor, self.sql)
+            cursor.executemany(self.sql.INSERT_LOGS, events)
+            activity_rollup.roll_up(cursor, last_log_id, self.sql)
+            connection.commit()
+            cursor.close()
+
+    def logs_page(self, action=None, user_id=None, start=None, end=None, limit=100, after=None, before=None):
+        """One keyset page of audit logs across hot and archived rows, newest first
+
+        Arguments as queries.logs_page; `end` is exclusive.
+        """
+        sql, params = self.sql.logs_page(action, user_id, start, end, limit, after, before)
+        logs = self._fetchall(sql, params)
+        logs = log_archive.merge_archive(logs, action, user_id, start, end, limit, after, before, self.archive_dir)
+        if before and not after:
+            logs.reverse()
+        return logs
+
+    def log_actions(self):
+        """Distinct audit log actions, alphabetically"""
+        return [row['action'] for row in self._fetchall(self.sql.LOG_ACTIONS)]
+
+    def max_log_id(self):
+        """Highest log_id written so far (0 for an empty log)"""
+        return self._fetchone(self.sql.MAX_LOG_ID)['max_log_id'] #type: ignore
+
+    def logs_since(self, since, action=None, user_id=None, start=None, end=None, limit=100):
+        """The newest `limit` audit logs with log_id > `since`, newest first
+
+        Filters as logs_page. Only hot rows: archived months never gain rows.
+        """
+        sql, params = self.sql.logs_page(action, user_id, start, end, limit, since=since)
+        return self._fetchall(sql, params)
+
+    def activity_stats(self, start, end):
+        """(daily, per action, per day and hour) counts from the hourly rollup; end is exclusive"""
+        with self.backend.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(self.sql.DAILY_ACTIVITY, (start, end))
+            daily_stats = cursor.fetchall()
+            cursor.execute(self.sql.ACTION_COUNTS, (start, end))
+            action_stats = cursor.fetchall()
+            cursor.execute(self.sql.HOURLY_HEATMAP, (start, end))
+            heatmap_stats = cursor.fetchall()
+            cursor.close()
+        return daily_stats, action_stats, heatmap_stats
+
+    # Exports and backups
+    # Streamed by db/export.py, so these return (sql, params) in this
+    # backend's dialect instead of rows
+
+    def patients_export_query(self, view):
+        """Every row of a patient view, newest first"""
+        return self.sql.patients_page(view, limit=None)
+
+    def logs_export_query(self, action=None, user_id=None, start=None, end=None):
+        """Every hot audit log matching the filters, newest first; `end` is exclusive"""
+        return self.sql.logs_page(action, user_id, start, end, limit=None)
+
+    def archived_logs(self, action=None, user_id=None, start=None, end=None):
+        """Archived audit logs matching the filters, as chunks of rows in the export's columns"""
+        return log_archive.iter_archive(action, user_id, start, end, archive_dir=self.archive_dir)
+
+    def table_backup_queries(self):
+        """(sql, params) per table for the CSV backup"""
+        return {'patients': (self.sql.BACKUP_PATIENTS, ()), 'logs': (self.sql.BACKUP_LOGS, ())}
+
+    @property
+    def supports_parquet_backup(self):
+        """db/backup.py reads MySQL column metadata and consistent snapshots"""
+        return self.backend.name == 'mysql'
+
+    def pool_stats(self):
+        """Connection pool usage of the backend (in use, waits, wait time)"""
+        return self.backend.pool_stats()
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    """Return the process-wide repository on the configured backend"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = Repository(get_backend())
+    return _repository
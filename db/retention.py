@@ -0,0 +1,104 @@
+# Retention Purge
+#
+# Deletes patients past their data_retention_date in bounded batches by
+# primary key: each batch is its own short transaction, with a pause in
+# between so other sessions' reads and writes are never stalled for long.
+# One summarized "Data Retention" audit entry is written per run.
+#
+#   python -m db.retention [--batch-size 1000] [--pause 0.1] [--max-batches N]
+import argparse
+import sys
+import time
+from datetime import date, datetime
+from mysql.connector import Error
+from config import config
+from db import overview_metrics
+from db.backend import get_backend
+from db.audit_writer import get_audit_writer
+
+PURGE_LOCK = "hospital_retention_purge"
+
+DELETE_BATCH_SQL = "DELETE FROM patients WHERE patient_id IN ({ids}) AND data_retention_date < %s"
+
+
+def purge_expired(user_id=None, role=None, batch_size=None, pause=None, max_batches=None,
+                  cutoff=None, progress_callback=None):
+    """Delete expired patients batch by batch; returns a summary dict
+
+    `cutoff` defaults to today (rows with data_retention_date before it are
+    deleted). Only one purge runs at a time across server processes; a
+    second caller gets summary['skipped'] = True.
+    """
+    batch_size = batch_size or config.RETENTION_PURGE_BATCH_SIZE
+    pause = config.RETENTION_PURGE_PAUSE if pause is None else pause
+    cutoff = cutoff or date.today()
+    summary = {'deleted': 0, 'batches': 0, 'skipped': False, 'cutoff': cutoff.isoformat()}
+    start = time.perf_counter()
+
+    backend = get_backend()
+    try:
+        with backend.connection() as connection, backend.try_lock(connection, PURGE_LOCK) as acquired:
+            if not acquired:
+                summary['skipped'] = True
+                return summary
+            cursor = connection.cursor()
+            while max_batches is None or summary['batches'] < max_batches:
+                cursor.execute(backend.sql.EXPIRED_PATIENT_IDS, (cutoff, batch_size))
+                ids = [row[0] for row in cursor.fetchall()] #type: ignore
+                if not ids:
+                    break
+                cursor.execute(
+                    DELETE_BATCH_SQL.format(ids=', '.join(['%s'] * len(ids))),
+                    (*ids, cutoff)
+                )
+                summary['deleted'] += cursor.rowcount
+                summary['batches'] += 1
+                connection.commit()
+                overview_metrics.invalidate()
+
+                if progress_callback:
+                    progress_callback(summary)
+                if len(ids) < batch_size:
+                    break
+                time.sleep(pause)
+            cursor.close()
+    finally:
+        # Committed batches are audited even if a later batch failed
+        summary['seconds'] = time.perf_counter() - start
+        if summary['batches']:
+            get_audit_writer().submit((
+                user_id, role, "Data Retention", datetime.now(),
+                f"Deleted {summary['deleted']} expired records (retention before {summary['cutoff']}) "
+                f"in {summary['batches']} batches over {summary['seconds']:.1f}s"
+            ))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete patients past their retention date in small batches")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"patients per transaction (default {config.RETENTION_PURGE_BATCH_SIZE})")
+    parser.add_argument("--pause", type=float, default=None, help=f"seconds between batches (default {config.RETENTION_PURGE_PAUSE})")
+    parser.add_argument("--max-batches", type=int, default=None, help="stop after this many batches")
+    parser.add_argument("--user-id", type=int, default=None, help="user recorded in the audit log")
+    parser.add_argument("--role", default="admin", help="role recorded in the audit log")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = purge_expired(
+            args.user_id, args.role, args.batch_size, args.pause, args.max_batches,
+            progress_callback=lambda s: print(f"\r{s['deleted']:,} deleted in {s['batches']:,} batches", end="")
+        )
+    except Error as e:
+        print(f"Retention purge failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        get_audit_writer().flush()
+    if summary['skipped']:
+        print("Another retention purge is already running")
+        return 0
+    print(f"\nDeleted {summary['deleted']:,} expired records in {summary['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
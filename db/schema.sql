@@ -1,3 +1,6 @@
+-- Current full schema for reference/manual import.
+-- The app applies db/migrations/ in order; keep this file in sync with them.
+
 CREATE TABLE IF NOT EXISTS users (
     user_id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(100) UNIQUE NOT NULL,
@@ -15,17 +18,68 @@ CREATE TABLE IF NOT EXISTS patients (
     anonymized_contact VARCHAR(50),
     encrypted_name TEXT,
     encrypted_contact TEXT,
+    name_index CHAR(64),
+    contact_index CHAR(64),
     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     data_retention_date DATE,
-    is_anonymized BOOLEAN DEFAULT FALSE
+    is_anonymized BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_patients_is_anonymized (is_anonymized),
+    INDEX idx_patients_retention_date (data_retention_date),
+    INDEX idx_patients_date_added (date_added),
+    INDEX idx_patients_updated_at (updated_at),
+    INDEX idx_patients_name_index (name_index),
+    INDEX idx_patients_contact_index (contact_index),
+    FULLTEXT INDEX ft_patients_diagnosis (diagnosis)
 );
 
 CREATE TABLE IF NOT EXISTS logs (
-    log_id INT AUTO_INCREMENT PRIMARY KEY,
+    log_id INT AUTO_INCREMENT,
     user_id INT,
     role VARCHAR(50),
     action VARCHAR(255),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     details TEXT,
-    FOREIGN KEY (user_id) REFERENCES users(user_id)
-);
\ No newline at end of file
+    PRIMARY KEY (log_id, timestamp),
+    INDEX idx_logs_timestamp (timestamp),
+    INDEX idx_logs_action_timestamp (action, timestamp),
+    INDEX idx_logs_user_timestamp (user_id, timestamp)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS deleted_patients (
+    deletion_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    patient_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS activity_rollup (
+    hour_bucket DATETIME NOT NULL,
+    action VARCHAR(255) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    event_count INT NOT NULL,
+    PRIMARY KEY (hour_bucket, action, role),
+    INDEX idx_rollup_action (action)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_watermark (
+    name VARCHAR(50) PRIMARY KEY,
+    last_log_id BIGINT NOT NULL
+);
+
+INSERT INTO rollup_watermark (name, last_log_id) VALUES ('activity_rollup', 0);
+
+CREATE TABLE IF NOT EXISTS key_rotation (
+    key_fingerprint CHAR(12) PRIMARY KEY,
+    last_patient_id INT NOT NULL DEFAULT 0,
+    max_patient_id INT NOT NULL DEFAULT 0,
+    rotated BIGINT NOT NULL DEFAULT 0,
+    failed BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL
+);
+
+CREATE TRIGGER trg_patients_after_delete AFTER DELETE ON patients
+FOR EACH ROW INSERT INTO deleted_patients (patient_id) VALUES (OLD.patient_id);
\ No newline at end of file
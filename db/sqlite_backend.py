@@ -0,0 +1,239 @@
+# Embedded SQLite Backend
+# A single database file in WAL mode, for local benchmarking and small
+# single-server deployments. Connections and cursors mimic the subset of
+# mysql.connector the data layer uses (%s placeholders, dictionary cursors,
+# column_names, commit/rollback, `with backend.connection() as connection:`)
+# and raise mysql.connector.Error, so callers' error handling is unchanged.
+# Run one server process per database file.
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from mysql.connector import Error
+import streamlit as st
+from config import config
+import instrumentation
+from db import sqlite_queries
+from db.db import DEFAULT_USERS, migration_files
+
+SQLITE_MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'sqlite')
+
+# Stored as text that sorts and compares like MySQL's values
+sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+# Declared columns use PARSE_DECLTYPES; computed ones opt in with an
+# `AS "name [TYPE]"` alias (PARSE_COLNAMES)
+
+
+def _translate(sql):
+    return sql.replace('%s', '?')
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over a sqlite3 cursor"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(_translate(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+
+    def executemany(self, sql, rows):
+        try:
+            self._cursor.executemany(_translate(sql), rows)
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Borrowed SQLite connection; close() hands it back to the backend"""
+
+    def __init__(self, backend, connection):
+        self._backend = backend
+        self._connection = connection
+
+    def cursor(self, dictionary=False, buffered=None):
+        return instrumentation.instrument_cursor(SQLiteCursor(self._connection.cursor(), dictionary))
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        if self._connection is not None:
+            self._backend.release(self._connection)
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class SQLiteBackend:
+    """Embedded SQLite file with the same tables and indexes as MySQL"""
+
+    name = 'sqlite'
+    sql = sqlite_queries
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self._idle = []
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._named_locks = {}
+        self._schema_ready = False
+
+    def _connect(self):
+        # isolation_level IMMEDIATE: the implicit BEGIN before a write takes
+        # the write lock up front instead of failing on upgrade
+        connection = sqlite3.connect(
+            self.path, timeout=self.timeout, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level='IMMEDIATE', check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def connection(self):
+        """Borrow a connection; use as `with backend.connection() as connection:`"""
+        started = time.perf_counter()
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._opened += 1
+        try:
+            connection = SQLiteConnection(self, connection or self._connect())
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+        instrumentation.record_connection(time.perf_counter() - started)
+        return connection
+
+    def release(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        with self._lock:
+            self._idle.append(connection)
+
+    def pool_stats(self):
+        """Open, idle and in-use connections"""
+        with self._lock:
+            return {'open': self._opened, 'idle': len(self._idle), 'in_use': self._opened - len(self._idle)}
+
+    def initialize(self):
+        """Create the database file and apply pending SQLite migrations once"""
+        if self._schema_ready:
+            return True
+        with self._lock:
+            if self._schema_ready:
+                return True
+            try:
+                self.bootstrap_schema()
+            except (sqlite3.Error, Error) as e:
+                st.error(f"Database initialization error: {e}")
+                return False
+            self._schema_ready = True
+            return True
+
+    def bootstrap_schema(self):
+        """Apply every migration in db/migrations/sqlite and seed default users"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+                )
+            """)
+            connection.commit()
+            applied = {row[0] for row in connection.execute("SELECT version FROM schema_version")}
+            for version, name, path in migration_files(SQLITE_MIGRATIONS_DIR):
+                if version in applied:
+                    continue
+                with open(path, encoding='utf-8') as f:
+                    script = f.read()
+                # One transaction per script, including its schema_version row
+                connection.executescript(
+                    f"BEGIN IMMEDIATE;\n{script}\n"
+                    f"INSERT INTO schema_version (version, name) VALUES ({version}, '{name}');\nCOMMIT;"
+                )
+            if connection.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+                connection.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", DEFAULT_USERS)
+                connection.commit()
+        finally:
+            connection.close()
+
+    def first_insert_id(self, cursor, count):
+        """ID of the first row of the last multi-row INSERT"""
+        # The write lock is held, so the batch's AUTOINCREMENT IDs are consecutive
+        cursor.execute("SELECT last_insert_rowid()")
+        return cursor.fetchone()[0] - count + 1 #type: ignore
+
+    @contextmanager
+    def try_lock(self, connection, name):
+        """Non-blocking named lock (this process only); yields whether it was acquired"""
+        with self._lock:
+            lock = self._named_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
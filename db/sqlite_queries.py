@@ -0,0 +1,93 @@
+# SQLite Dialect
+# Everything in db/queries.py, with the statements that use MySQL-only
+# syntax (CURDATE, HOUR, LPAD, FOR UPDATE, ON DUPLICATE KEY) redefined.
+# Placeholders stay %s; the SQLite backend rewrites them to ?.
+from db import queries
+from db.queries import *  # noqa: F401,F403
+
+TODAY = "date('now', 'localtime')"
+TOMORROW = "date('now', 'localtime', '+1 day')"
+
+# SQLite computes DATE() as text; the "[DATE]" column type makes the
+# backend convert it to datetime.date, as MySQL returns it
+DAILY_ACTIVITY = """
+    SELECT DATE(hour_bucket) as "date [DATE]", SUM(event_count) as count
+    FROM activity_rollup
+    WHERE hour_bucket >= %s AND hour_bucket < %s
+    GROUP BY DATE(hour_bucket)
+    ORDER BY 1
+"""
+
+HOURLY_HEATMAP = """
+    SELECT DATE(hour_bucket) as "date [DATE]", CAST(strftime('%H', hour_bucket) AS INTEGER) as hour,
+           SUM(event_count) as count
+    FROM activity_rollup
+    WHERE hour_bucket >= %s AND hour_bucket < %s
+    GROUP BY DATE(hour_bucket), strftime('%H', hour_bucket)
+"""
+
+OVERVIEW_METRICS = f"""
+    SELECT
+        (SELECT COUNT(*) FROM patients) as total_patients,
+        (SELECT COUNT(*) FROM patients WHERE is_anonymized = TRUE) as anonymized_patients,
+        (SELECT COUNT(*) FROM logs
+         WHERE timestamp >= {TODAY} AND timestamp < {TOMORROW}) as today_activities,
+        (SELECT COUNT(*) FROM patients WHERE data_retention_date < {TODAY}) as expired_records
+"""
+
+# The UPDATE takes SQLite's write lock, which serialises log writers the way
+# FOR UPDATE does on MySQL
+LOCK_WATERMARK = """
+    UPDATE rollup_watermark SET last_log_id = last_log_id WHERE name = %s
+    RETURNING last_log_id
+"""
+
+ROLL_UP_ACTIVITY = """
+    INSERT INTO activity_rollup (hour_bucket, action, role, event_count)
+    SELECT strftime('%Y-%m-%d %H:00:00', timestamp), COALESCE(action, ''), COALESCE(role, ''), COUNT(*)
+    FROM logs
+    WHERE log_id > %s AND log_id <= %s
+    GROUP BY 1, 2, 3
+    ON CONFLICT (hour_bucket, action, role) DO UPDATE SET event_count = event_count + excluded.event_count
+"""
+
+ADD_ACTIVITY_COUNTS = """
+    INSERT INTO activity_rollup (hour_bucket, action, role, event_count)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (hour_bucket, action, role) DO UPDATE SET event_count = event_count + excluded.event_count
+"""
+
+ANON_NAME_SQL = "'ANON_' || printf('%04d', patient_id)"
+ANON_CONTACT_SQL = ("CASE WHEN LENGTH(contact) >= 4 THEN 'XXX-XXX-' || SUBSTR(contact, -4) "
+                    "ELSE 'XXX-XXX-XXXX' END")
+
+ANONYMIZE_PATIENT = f"""
+    UPDATE patients SET anonymized_name = {ANON_NAME_SQL}, anonymized_contact = {ANON_CONTACT_SQL},
+                        is_anonymized = TRUE
+    WHERE patient_id = %s
+"""
+
+ANONYMIZE_NAMES_FROM = f"""
+    UPDATE patients SET anonymized_name = {ANON_NAME_SQL}, is_anonymized = TRUE
+    WHERE patient_id >= %s AND anonymized_name IS NULL
+"""
+
+def search_patients(view, terms, limit=50, offset=0):
+    """Ranked patient search over patients_fts (bm25); same contract as queries.search_patients"""
+    if len(terms) == 1 and terms[0].isdigit():
+        return queries.search_patients(view, terms, limit, offset)
+    doctor = "WHERE is_anonymized = TRUE" if view == 'doctor' else ""
+    query = " AND ".join(f'"{term}"*' for term in terms)
+    sql = f"""
+        SELECT {PATIENT_VIEWS[view]}, -matches.rank AS relevance
+        FROM patients
+        JOIN (SELECT rowid AS match_id, rank FROM patients_fts WHERE patients_fts MATCH %s) AS matches
+          ON matches.match_id = patients.patient_id
+        {doctor}
+        ORDER BY matches.rank, patient_id DESC
+    """
+    params = [query]
+    if limit is not None:
+        sql += "LIMIT %s OFFSET %s"
+        params += [limit, offset]
+    return sql, tuple(params)
@@ -1,17 +1,12 @@
-from venv import create
 import streamlit as st
-import mysql.connector
 from mysql.connector import Error
 import hashlib
-import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-from cryptography.fernet import Fernet
-import base64
-import os
 from config import config
-from db.db import create_connection, initialize_database
+from db.repository import get_repository
+from db import overview_metrics
+from db.queries import is_contact_query
+from db.audit_writer import get_audit_writer
 
 # Page configuration
 st.set_page_config(
@@ -66,9 +61,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# Encryption key generation (store this securely in production)
-ENCRYPTION_KEY = b'8cozhW9kSi6zJQw3xLvMp_6T3Nq3qjWPHvXFnwi4IxE='  # Generated key
-
 # Initialize session state
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -84,55 +76,45 @@ if 'system_start_time' not in st.session_state:
     st.session_state.system_start_time = datetime.now()
 
 
-def log_activity(user_id, role, action, details=""):
-    """Log user activity"""
+def initialize_database():
+    """Create or migrate the configured storage backend once per server process"""
+    return get_repository().initialize()
+
+def log_activity(user_id, role, action, details="", durable=False):
+    """Log user activity (queued for the batch writer; durable=True writes before returning)"""
+    event = (user_id, role, action, datetime.now(), details)
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor()
-            cursor.execute(
-                "INSERT INTO logs (user_id, role, action, details) VALUES (%s, %s, %s, %s)",
-                (user_id, role, action, details)
-            )
-            connection.commit()
-            cursor.close()
-            connection.close()
+        writer = get_audit_writer()
+        if durable:
+            writer.write_sync([event])
+        else:
+            writer.submit(event)
     except Error as e:
         st.error(f"Logging error: {e}")
 
 def authenticate_user(username, password):
     """Authenticate user credentials"""
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            cursor.execute(
-                "SELECT user_id, username, role FROM users WHERE username = %s AND password = %s",
-                (username, hashed_password)
-            )
-            user = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            return user
+        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        return get_repository().authenticate(username, hashed_password)
     except Error as e:
         st.error(f"Authentication error: {e}")
         return None
 
 def encrypt_data(data):
     """Encrypt data using Fernet"""
+    import crypto_service  # cryptography loads on first use, not on the login page
     try:
-        f = Fernet(ENCRYPTION_KEY)
-        return f.encrypt(data.encode()).decode()
+        return crypto_service.encrypt(data)
     except Exception as e:
         st.error(f"Encryption error: {e}")
         return None
 
 def decrypt_data(encrypted_data):
     """Decrypt data using Fernet"""
+    import crypto_service
     try:
-        f = Fernet(ENCRYPTION_KEY)
-        return f.decrypt(encrypted_data.encode()).decode()
+        return crypto_service.decrypt(encrypted_data)
     except Exception as e:
         st.error(f"Decryption error: {e}")
         return None
@@ -149,229 +131,190 @@ def anonymize_contact(contact):
 
 def add_patient(name, contact, diagnosis, encrypt=False):
     """Add new patient record"""
+    import crypto_service
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor()
-            
-            # Set data retention date (90 days from now for GDPR compliance)
-            retention_date = (datetime.now() + timedelta(days=90)).date()
-            
-            if encrypt:
-                encrypted_name = encrypt_data(name)
-                encrypted_contact = encrypt_data(contact)
-                cursor.execute(
-                    """INSERT INTO patients (name, contact, diagnosis, encrypted_name, 
-                       encrypted_contact, data_retention_date, is_anonymized) 
-                       VALUES (%s, %s, %s, %s, %s, %s, FALSE)""",
-                    (name, contact, diagnosis, encrypted_name, encrypted_contact, retention_date)
-                )
-            else:
-                cursor.execute(
-                    """INSERT INTO patients (name, contact, diagnosis, data_retention_date, is_anonymized) 
-                       VALUES (%s, %s, %s, %s, FALSE)""",
-                    (name, contact, diagnosis, retention_date)
-                )
-            
-            connection.commit()
-            patient_id = cursor.lastrowid
-            cursor.close()
-            connection.close()
-            
-            log_activity(
-                st.session_state.user_id,
-                st.session_state.role,
-                "Add Patient",
-                f"Added patient ID: {patient_id}"
-            )
-            return True
+        # Set data retention date (90 days from now for GDPR compliance)
+        retention_date = (datetime.now() + timedelta(days=90)).date()
+        
+        encrypted_name = encrypt_data(name) if encrypt else None
+        encrypted_contact = encrypt_data(contact) if encrypt else None
+        patient_id = get_repository().add_patient(
+            name, contact, diagnosis, retention_date, encrypted_name, encrypted_contact,
+            crypto_service.blind_index('name', name), crypto_service.blind_index('contact', contact)
+        )
+        overview_metrics.invalidate()
+        
+        log_activity(
+            st.session_state.user_id,
+            st.session_state.role,
+            "Add Patient",
+            f"Added patient ID: {patient_id}"
+        )
+        return True
     except Error as e:
         st.error(f"Error adding patient: {e}")
         return False
 
-def anonymize_patient_data(patient_id):
-    """Anonymize specific patient data"""
+def find_duplicate_patients(name, contact):
+    """Existing patients with the same contact number (matched by blind index), same name first
+
+    Empty while blind indexes are disabled (crypto_service.blind_index_enabled).
+    """
+    import crypto_service
+    if not crypto_service.blind_index_enabled():
+        return []
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT name, contact FROM patients WHERE patient_id = %s", (patient_id,))
-            patient = cursor.fetchone()
-            
-            if patient:
-                anon_name = anonymize_name(patient['name'], patient_id) #type: ignore
-                anon_contact = anonymize_contact(patient['contact']) #type: ignore
-                
-                cursor.execute(
-                    """UPDATE patients SET anonymized_name = %s, anonymized_contact = %s, 
-                       is_anonymized = TRUE WHERE patient_id = %s""",
-                    (anon_name, anon_contact, patient_id)
-                )
-                connection.commit()
-                
-                log_activity(
-                    st.session_state.user_id,
-                    st.session_state.role,
-                    "Anonymize Data",
-                    f"Anonymized patient ID: {patient_id}"
-                )
-            
-            cursor.close()
-            connection.close()
-            return True
+        return get_repository().duplicate_patients(
+            crypto_service.blind_index('name', name), crypto_service.blind_index('contact', contact)
+        )
     except Error as e:
-        st.error(f"Error anonymizing data: {e}")
-        return False
+        st.error(f"Error checking for duplicates: {e}")
+        return []
+
+def patient_view(role, anonymized_view=False):
+    """Column projection a role is allowed to see"""
+    if role == 'admin':
+        return 'admin_anonymized' if anonymized_view else 'admin'
+    if role == 'doctor':
+        return 'doctor'
+    return 'receptionist'
 
-def anonymize_all_patients():
-    """Anonymize all patient records"""
+def get_patients(role, limit=50, after=None, before=None, anonymized_view=False):
+    """Get one page of patients based on role, newest first
+    
+    `after` / `before` are patient_id keyset cursors taken from the last /
+    first row of the current page.
+    """
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT patient_id, name, contact FROM patients")
-            patients = cursor.fetchall()
-            
-            for patient in patients:
-                anon_name = anonymize_name(patient['name'], patient['patient_id']) #type: ignore
-                anon_contact = anonymize_contact(patient['contact']) #type: ignore
-                
-                cursor.execute(
-                    """UPDATE patients SET anonymized_name = %s, anonymized_contact = %s, 
-                       is_anonymized = TRUE WHERE patient_id = %s""",
-                    (anon_name, anon_contact, patient['patient_id']) #type: ignore
-                )
-            
-            connection.commit()
-            cursor.close()
-            connection.close()
-            
-            log_activity(
-                st.session_state.user_id,
-                st.session_state.role,
-                "Bulk Anonymization",
-                f"Anonymized {len(patients)} patient records"
-            )
-            return True
+        patients = get_repository().patients_page(patient_view(role, anonymized_view), limit, after, before)
+        
+        log_activity(
+            st.session_state.user_id,
+            st.session_state.role,
+            "View Patients",
+            f"Accessed patient records"
+        )
+        
+        return patients
     except Error as e:
-        st.error(f"Error in bulk anonymization: {e}")
-        return False
+        st.error(f"Error fetching patients: {e}")
+        return []
 
-def get_patients(role):
-    """Get patients based on role"""
+def search_patients(role, text, limit=50, offset=0, anonymized_view=False):
+    """Get one page of patients whose diagnosis matches `text` (or whose ID is `text`), best match first
+    
+    Admins can also enter a contact number, matched exactly through its blind
+    index, unless blind indexes are disabled.
+    """
+    import crypto_service
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            if role == 'admin':
-                cursor.execute("""
-                    SELECT patient_id, name, contact, diagnosis, 
-                           anonymized_name, anonymized_contact, 
-                           date_added, data_retention_date, is_anonymized
-                    FROM patients ORDER BY patient_id DESC
-                """)
-            elif role == 'doctor':
-                cursor.execute("""
-                    SELECT patient_id, anonymized_name as name, 
-                           anonymized_contact as contact, diagnosis, 
-                           date_added, is_anonymized
-                    FROM patients WHERE is_anonymized = TRUE 
-                    ORDER BY patient_id DESC
-                """)
-            else:  # receptionist
-                cursor.execute("""
-                    SELECT patient_id, 'HIDDEN' as name, 'HIDDEN' as contact, 
-                           'HIDDEN' as diagnosis, date_added
-                    FROM patients ORDER BY patient_id DESC
-                """)
-            
-            patients = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            
-            log_activity(
-                st.session_state.user_id,
-                st.session_state.role,
-                "View Patients",
-                f"Accessed patient records"
-            )
-            
-            return patients
+        view = patient_view(role, anonymized_view)
+        if role == 'admin' and is_contact_query(text) and crypto_service.blind_index_enabled():
+            patients = get_repository().patients_by_contact(view, crypto_service.blind_index('contact', text), limit, offset)
+        else:
+            patients = get_repository().search_patients(view, text, limit, offset)
+        
+        # The query itself may contain health data, so only its size is logged
+        log_activity(
+            st.session_state.user_id,
+            st.session_state.role,
+            "Search Patients",
+            f"Searched patient records ({len(patients)} results)"
+        )
+        
+        return patients
     except Error as e:
-        st.error(f"Error fetching patients: {e}")
+        st.error(f"Error searching patients: {e}")
         return []
 
-def get_logs():
-    """Get all activity logs"""
+def count_patients(role):
+    """Count the patients a role can list (from the cached overview counters)"""
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT l.log_id, l.user_id, u.username, l.role, l.action, 
-                       l.timestamp, l.details
-                FROM logs l
-                JOIN users u ON l.user_id = u.user_id
-                ORDER BY l.timestamp DESC
-                LIMIT 100
-            """)
-            logs = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return logs
+        metrics = overview_metrics.get_overview_metrics()
+        return metrics['anonymized_patients' if role == 'doctor' else 'total_patients'] #type: ignore
     except Error as e:
+        st.error(f"Error counting patients: {e}")
+        return 0
+
+def get_logs(action=None, user_id=None, start_date=None, end_date=None, limit=100, after=None, before=None):
+    """Get one page of activity logs, newest first
+    
+    Filters run in SQL; `after` / `before` are (timestamp, log_id) keyset
+    cursors taken from the last / first row of the current page.
+    """
+    end = end_date + timedelta(days=1) if end_date else None
+    try:
+        return get_repository().logs_page(action, user_id, start_date, end, limit, after, before)
+    except (Error, OSError) as e:
         st.error(f"Error fetching logs: {e}")
         return []
 
-def get_activity_stats():
-    """Get activity statistics for dashboard"""
+def get_log_feed(feed, limit, action=None, user_id=None, start_date=None, end_date=None):
+    """Newest `limit` activity logs for a live view, refreshed incrementally
+    
+    The first call for a feed in this session, or after its filters
+    change, loads the whole page. Later calls fetch only logs with a
+    higher log_id than the session has seen and merge them into its
+    cached rows. Returns (rows newest first, rows new since the last call;
+    0 after a full load).
+    """
+    end = end_date + timedelta(days=1) if end_date else None
+    key = (action, user_id, start_date, end_date, limit)
+    feeds = st.session_state.setdefault('log_feeds', {})
+    cached = feeds.get(feed)
+    try:
+        repository = get_repository()
+        if cached is None or cached['key'] != key:
+            # Watermark first: a log written in between arrives twice, never zero times
+            last_log_id = repository.max_log_id()
+            rows = repository.logs_page(action, user_id, start_date, end, limit)
+            feeds[feed] = {'key': key, 'rows': rows, 'last_log_id': last_log_id}
+            return rows, 0
+        
+        delta = repository.logs_since(cached['last_log_id'], action, user_id, start_date, end, limit)
+        if delta:
+            seen = {row['log_id'] for row in delta}
+            rows = delta + [row for row in cached['rows'] if row['log_id'] not in seen]
+            rows.sort(key=lambda row: (row['timestamp'], row['log_id']), reverse=True)
+            cached['rows'] = rows[:limit]
+            cached['last_log_id'] = max(cached['last_log_id'], max(seen))
+        return cached['rows'], len(delta)
+    except (Error, OSError) as e:
+        st.error(f"Error fetching logs: {e}")
+        return (cached['rows'] if cached else []), 0
+
+@st.cache_data(ttl=config.LOG_ACTIONS_CACHE_TTL, show_spinner=False)
+def _log_actions():
+    return get_repository().log_actions()
+
+def get_log_actions():
+    """Distinct logged actions for the audit log filter (cached process-wide)"""
+    try:
+        return _log_actions()
+    except Error as e:
+        st.error(f"Error fetching log actions: {e}")
+        return []
+
+def get_users():
+    """Get user IDs and usernames for filters"""
+    try:
+        return get_repository().users()
+    except Error as e:
+        st.error(f"Error fetching users: {e}")
+        return []
+
+def get_activity_stats(start, end):
+    """Get activity statistics for dashboard from the hourly rollup; end is exclusive"""
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            # Get action counts by day (last 7 days)
-            cursor.execute("""
-                SELECT DATE(timestamp) as date, COUNT(*) as count
-                FROM logs
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                GROUP BY DATE(timestamp)
-                ORDER BY date
-            """)
-            daily_stats = cursor.fetchall()
-            
-            # Get action counts by type
-            cursor.execute("""
-                SELECT action, COUNT(*) as count
-                FROM logs
-                GROUP BY action
-                ORDER BY count DESC
-            """)
-            action_stats = cursor.fetchall()
-            
-            cursor.close()
-            connection.close()
-            return daily_stats, action_stats
+        return get_repository().activity_stats(start, end)
     except Error as e:
         st.error(f"Error fetching stats: {e}")
-        return [], []
+        return [], [], []
 
-def check_data_retention():
-    """Check and flag patients past retention date"""
+def check_data_retention(limit=50, after=None):
+    """One page of patients past their retention date, oldest first"""
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT patient_id, name, data_retention_date
-                FROM patients
-                WHERE data_retention_date < CURDATE()
-            """)
-            expired = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return expired
+        return get_repository().expired_patients(datetime.now().date(), limit, after)
     except Error as e:
         st.error(f"Error checking retention: {e}")
         return []
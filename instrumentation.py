@@ -0,0 +1,366 @@
+# Query and Render Instrumentation
+# In-process histograms of SQL statement latency (by fingerprint), rows
+# returned, connection checkout time and show_* render time, with the number
+# of queries and connections each render used. Read them in the admin
+# Performance tab or scrape them in Prometheus text format from
+# METRICS_PORT.
+import functools
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import config
+
+# Upper bounds in seconds, as Prometheus `le` labels
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+SAMPLE_SIZE = 1000  # recent observations kept per histogram for percentiles
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"IN \(\?(?:, ?\?)*\)", re.IGNORECASE)
+
+
+class Histogram:
+    """Cumulative bucket counts (for Prometheus) plus recent samples (for percentiles)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, q):
+        """q-th percentile (0-100) of the recent samples, or None"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+class _Statement:
+    """Fingerprint of a SQL statement with its latency and row histograms"""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.query_id = hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+        self.latency = Histogram()
+        self.rows = Histogram(COUNT_BUCKETS)
+
+
+_lock = threading.Lock()
+_statements = {}
+_renders = {}  # page -> {'seconds', 'queries', 'connections'} histograms
+_connections = Histogram()
+_collectors = {}
+_local = threading.local()
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Statement text with literals and placeholders replaced by ?"""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _LITERALS.sub("?", sql.replace("%s", "?"))
+    return _IN_LISTS.sub("IN (...)", sql)
+
+
+def _frames():
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def record_query(sql, seconds, rows):
+    """Add one executed statement"""
+    fp = fingerprint(sql)
+    with _lock:
+        statement = _statements.get(fp)
+        if statement is None:
+            statement = _statements[fp] = _Statement(fp)
+        statement.latency.observe(seconds)
+        statement.rows.observe(rows)
+    for frame in _frames():
+        frame['queries'] += 1
+
+
+def record_connection(seconds):
+    """Add one connection checkout (pool wait plus connect)"""
+    if not config.INSTRUMENTATION_ENABLED:
+        return
+    with _lock:
+        _connections.observe(seconds)
+    for frame in _frames():
+        frame['connections'] += 1
+
+
+@contextmanager
+def render_timer(page):
+    """Time a block as a render of `page`, counting the queries and connections it used"""
+    frame = {'queries': 0, 'connections': 0}
+    frames = _frames()
+    frames.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        # By identity: nested frames compare equal while their counts match
+        frames[:] = [open_frame for open_frame in frames if open_frame is not frame]
+        if config.INSTRUMENTATION_ENABLED:
+            with _lock:
+                histograms = _renders.get(page)
+                if histograms is None:
+                    histograms = _renders[page] = {
+                        'seconds': Histogram(),
+                        'queries': Histogram(COUNT_BUCKETS),
+                        'connections': Histogram(COUNT_BUCKETS),
+                    }
+                histograms['seconds'].observe(elapsed)
+                histograms['queries'].observe(frame['queries'])
+                histograms['connections'].observe(frame['connections'])
+
+
+def timed_render(page):
+    """Decorator: record every call of a show_* function as a render of `page`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with render_timer(page):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InstrumentedCursor:
+    """DB-API cursor proxy that records each statement once its rows are consumed"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = None  # [sql, seconds so far, rows so far]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def _run(self, method, sql, *args, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            self._statement = [sql, time.perf_counter() - start, 0]
+            if self._cursor.description is None:
+                # No result set: rows affected instead of rows returned
+                self._statement[2] = max(self._cursor.rowcount, 0)
+                self._finish()
+
+    def execute(self, sql, *args, **kwargs):
+        return self._run(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._run(self._cursor.executemany, sql, *args, **kwargs)
+
+    def _fetched(self, start, rows, done):
+        if self._statement is not None:
+            self._statement[1] += time.perf_counter() - start
+            self._statement[2] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=1):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def _finish(self):
+        if self._statement is not None:
+            sql, seconds, rows = self._statement
+            self._statement = None
+            record_query(sql, seconds, rows)
+
+
+def instrument_cursor(cursor):
+    """Wrap a freshly opened cursor when instrumentation is enabled"""
+    return InstrumentedCursor(cursor) if config.INSTRUMENTATION_ENABLED else cursor
+
+
+def register_collector(name, collect):
+    """Export the numeric values of `collect()` (a dict) as `hms_<name>_<key>` gauges"""
+    with _lock:
+        _collectors[name] = collect
+
+
+def _summary(histogram):
+    return {
+        'count': histogram.count,
+        'p50': histogram.percentile(50),
+        'p95': histogram.percentile(95),
+        'p99': histogram.percentile(99),
+        'max': histogram.max,
+        'total': histogram.sum,
+    }
+
+
+def query_stats():
+    """Per statement fingerprint: count, p50/p95/p99/max/total seconds and mean rows"""
+    with _lock:
+        return [
+            dict(_summary(s.latency), query_id=s.query_id, statement=s.fingerprint,
+                 mean_rows=s.rows.sum / s.rows.count if s.rows.count else 0)
+            for s in _statements.values()
+        ]
+
+
+def render_stats():
+    """Per page: render count, p50/p95/p99/max seconds and mean queries/connections per render"""
+    with _lock:
+        return [
+            dict(_summary(h['seconds']), page=page,
+                 mean_queries=h['queries'].sum / h['queries'].count,
+                 mean_connections=h['connections'].sum / h['connections'].count)
+            for page, h in _renders.items()
+        ]
+
+
+def connection_stats():
+    """Connection checkout count and p50/p95/p99/max seconds"""
+    with _lock:
+        return _summary(_connections)
+
+
+def collector_stats():
+    """{collector name: values} from every registered collector"""
+    with _lock:
+        collectors = dict(_collectors)
+    stats = {}
+    for name, collect in collectors.items():
+        try:
+            stats[name] = collect()
+        except Exception as e:
+            stats[name] = {'error': str(e)}
+    return stats
+
+
+def reset():
+    """Forget every recorded observation"""
+    global _connections
+    with _lock:
+        _statements.clear()
+        _renders.clear()
+        _connections = Histogram()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name, histogram, labels=""):
+    sep = "," if labels else ""
+    lines = [f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}'
+             for bound, count in zip(histogram.buckets, histogram.bucket_counts)]
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def prometheus_text():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        lines += ["# HELP hms_query_duration_seconds SQL statement latency including fetch",
+                  "# TYPE hms_query_duration_seconds histogram"]
+        for s in _statements.values():
+            lines += _histogram_lines("hms_query_duration_seconds", s.latency, f'query_id="{s.query_id}"')
+        lines += ["# HELP hms_query_rows Rows returned (or affected) per statement",
+                  "# TYPE hms_query_rows histogram"]
+        for s in _statements.values():
+            lines += _histogram_lines("hms_query_rows", s.rows, f'query_id="{s.query_id}"')
+        lines += ["# HELP hms_query_info Statement fingerprint of each query_id",
+                  "# TYPE hms_query_info gauge"]
+        lines += [f'hms_query_info{{query_id="{s.query_id}",statement="{_escape(s.fingerprint)}"}} 1'
+                  for s in _statements.values()]
+        lines += ["# HELP hms_db_connection_seconds Connection checkout time",
+                  "# TYPE hms_db_connection_seconds histogram"]
+        lines += _histogram_lines("hms_db_connection_seconds", _connections)
+        for metric, key, text in (("hms_render_duration_seconds", 'seconds', "show_* render time"),
+                                  ("hms_render_queries", 'queries', "Queries per render"),
+                                  ("hms_render_connections", 'connections', "Connections per render")):
+            lines += [f"# HELP {metric} {text}", f"# TYPE {metric} histogram"]
+            for page, histograms in _renders.items():
+                lines += _histogram_lines(metric, histograms[key], f'page="{_escape(page)}"')
+    for name, values in collector_stats().items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE hms_{name}_{key} gauge", f"hms_{name}_{key} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server():
+    """Serve /metrics on METRICS_HOST:METRICS_PORT once per process (no-op when the port is 0)"""
+    global _server
+    if not config.METRICS_PORT or _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((config.METRICS_HOST, config.METRICS_PORT), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
@@ -27,11 +27,11 @@ def login_page():
                     st.session_state.role = user['role'] #type: ignore
                     st.session_state.user_id = user['user_id'] #type: ignore
                     
-                    log_activity(user['user_id'], user['role'], "Login", f"User {username} logged in") #type: ignore
+                    log_activity(user['user_id'], user['role'], "Login", f"User {username} logged in", durable=True) #type: ignore
                     st.success(f"Welcome, {username}!")
                     st.rerun() 
                 else:
                     st.error("Invalid credentials!")
-                    log_activity(None, None, "Failed Login", f"Failed login attempt for {username}")
+                    log_activity(None, None, "Failed Login", f"Failed login attempt for {username}", durable=True)
             else:
                 st.warning("Please enter both username and password")
\ No newline at end of file
@@ -1,8 +1,8 @@
 # Main Application Logic
 from hospital_dashboard import initialize_database
 import streamlit as st
+import instrumentation
 from login import login_page
-from main_dashboard import main_dashboard
 
 
 def main():
@@ -16,11 +16,17 @@ def main():
     if "user_id" not in st.session_state:
         st.session_state.user_id = None
 
+    # Serve Prometheus metrics when METRICS_PORT is set
+    instrumentation.start_metrics_server()
+
     # Initialize database
     if initialize_database():
         if not st.session_state.logged_in:
             login_page()
         else:
+            # Imported on first use: the dashboard pulls in pandas, plotly and
+            # pyarrow, which the login page does not need
+            from main_dashboard import main_dashboard
             main_dashboard()
     else:
         st.error("❌ Failed to initialize database. Please check MySQL connection settings.")
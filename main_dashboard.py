@@ -2,9 +2,34 @@
 import datetime
 import streamlit as st
 from hospital_dashboard import log_activity
-from show import show_anonymization, show_audit_logs, show_analytics, show_gdpr_settings, show_add_patient, show_consent_banner, show_overview, show_patients
+from instrumentation import timed_render
+from show import show_anonymization, show_audit_logs, show_analytics, show_gdpr_settings, show_add_patient, show_consent_banner, show_overview, show_patients, show_performance
 
 
+# Dashboard sections per role, in navigation order
+SECTIONS = {
+    'admin': {
+        "📊 Overview": show_overview,
+        "👥 Patients": show_patients,
+        "🔐 Anonymization": show_anonymization,
+        "📝 Audit Logs": show_audit_logs,
+        "📈 Analytics": show_analytics,
+        "⚙️ GDPR Settings": show_gdpr_settings,
+        "⏱️ Performance": show_performance,
+    },
+    'doctor': {
+        "📊 Overview": show_overview,
+        "👥 Patients": show_patients,
+    },
+    'receptionist': {
+        "📊 Overview": show_overview,
+        "➕ Add Patient": show_add_patient,
+    },
+}
+
+
+# Whole rerun, including the selected section
+@timed_render("Dashboard")
 def main_dashboard():
     # Sidebar
     with st.sidebar:
@@ -41,35 +66,17 @@ def main_dashboard():
     # Main header
     st.markdown('<div class="main-header">🏥 Hospital Management Dashboard</div>', unsafe_allow_html=True)
     
-    # Create tabs based on role
+    # Public default keys: the affected features are off until keys are set in .env
     if st.session_state.role == 'admin':
-        tabs = st.tabs(["📊 Overview", "👥 Patients", "🔐 Anonymization", "📝 Audit Logs", "📈 Analytics", "⚙️ GDPR Settings"])
-        
-        with tabs[0]:
-            show_overview()
-        with tabs[1]:
-            show_patients()
-        with tabs[2]:
-            show_anonymization()
-        with tabs[3]:
-            show_audit_logs()
-        with tabs[4]:
-            show_analytics()
-        with tabs[5]:
-            show_gdpr_settings()
+        import crypto_service
+        for message in crypto_service.default_key_warnings():
+            st.warning(f"⚠️ {message}")
     
-    elif st.session_state.role == 'doctor':
-        tabs = st.tabs(["📊 Overview", "👥 Patients"])
-        
-        with tabs[0]:
-            show_overview()
-        with tabs[1]:
-            show_patients()
-    
-    else:  # receptionist
-        tabs = st.tabs(["📊 Overview", "➕ Add Patient"])
-        
-        with tabs[0]:
-            show_overview()
-        with tabs[1]:
-            show_add_patient()
\ No newline at end of file
+    # Only the selected section runs, so a rerun queries one section's data
+    sections = SECTIONS.get(st.session_state.role, SECTIONS['receptionist'])
+    if st.session_state.get('dashboard_section') not in sections:
+        # First visit or another role's section: start on the overview
+        st.session_state.dashboard_section = next(iter(sections))
+    section = st.radio("Section", list(sections), horizontal=True, key="dashboard_section", label_visibility="collapsed")
+    st.markdown("---")
+    sections[section]()
@@ -1,70 +1,140 @@
+import os
+import tempfile
 import streamlit as st
-from hospital_dashboard import anonymize_all_patients, add_patient, create_connection, ENCRYPTION_KEY, get_activity_stats, get_logs, check_data_retention, log_activity, Error, get_patients, anonymize_patient_data
-import plotly.express as px
-from datetime import datetime
+from hospital_dashboard import add_patient, find_duplicate_patients, get_activity_stats, get_logs, get_log_actions, get_users, check_data_retention, log_activity, Error, get_log_feed, get_patients, search_patients, count_patients, patient_view
+from datetime import datetime, timedelta
 import pandas as pd
+from config import config
+from db.export import export_query_to_csv, read_and_remove
+from db.retention import purge_expired
+from db.repository import get_repository
+from db.overview_metrics import get_overview_metrics
+from db.audit_writer import get_audit_writer
+import instrumentation
+from instrumentation import timed_render
 
+# Analytics time ranges in days (None: pick dates)
+ANALYTICS_RANGES = {
+    "Last 7 Days": 7,
+    "Last 30 Days": 30,
+    "Last Year": 365,
+    "Custom": None,
+}
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+@timed_render("Anonymization")
 def show_anonymization():
     st.markdown("### 🔐 Data Anonymization")
     
     st.info("**Anonymization Process:**\n"
             "- Names → ANON_#### format\n"
             "- Contacts → XXX-XXX-#### format\n"
+            "- Applied when each patient is added, in the same transaction\n"
             "- Original data is preserved but hidden from non-admin users")
     
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("#### Bulk Anonymization")
-        if st.button("🔒 Anonymize All Patients", key="bulk_anon"):
-            with st.spinner("Anonymizing all patient records..."):
-                if anonymize_all_patients():
-                    st.success("All patient records have been anonymized!")
-                    st.rerun()
+        st.markdown("#### Anonymization Status")
+        try:
+            metrics = get_overview_metrics()
+            st.metric("Anonymized Records", f"{metrics['anonymized_patients']:,} of {metrics['total_patients']:,}") #type: ignore
+        except Error as e:
+            st.error(f"Error: {e}")
     
     with col2:
         st.markdown("#### Encryption Status")
         try:
-            connection = create_connection()
-            if connection:
-                cursor = connection.cursor(dictionary=True)
-                cursor.execute("SELECT COUNT(*) as count FROM patients WHERE encrypted_name IS NOT NULL")
-                encrypted_count = cursor.fetchone()['count'] #type: ignore
-                cursor.close()
-                connection.close()
-                st.metric("Encrypted Records", encrypted_count) #type: ignore
+            encrypted_count = get_repository().encrypted_count()
+            st.metric("Encrypted Records", encrypted_count) #type: ignore
         except Error as e:
             st.error(f"Error: {e}")
 
+@timed_render("Audit Logs")
 def show_audit_logs():
     st.markdown("### 📝 Integrity Audit Logs")
     
     # Filters
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        action_filter = st.selectbox("Filter by Action:", ["All", "Login", "Logout", "Add Patient", 
-                                                            "View Patients", "Anonymize Data", "GDPR Consent"])
+        action_filter = st.selectbox("Filter by Action:", ["All"] + get_log_actions())
     with col2:
-        date_filter = st.date_input("Filter by Date:", datetime.now())
+        user_ids = {"All": None}
+        user_ids.update({user['username']: user['user_id'] for user in get_users()}) #type: ignore
+        user_filter = st.selectbox("Filter by User:", list(user_ids))
     with col3:
+        today = datetime.now().date()
+        date_range = st.date_input("Filter by Date:", (today, today))
+    with col4:
         limit = st.selectbox("Show records:", [50, 100, 200, 500])
     
-    # Get logs
-    all_logs = get_logs()
+    if isinstance(date_range, (list, tuple)):
+        start_date = date_range[0] if date_range else None
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+    else:
+        start_date = end_date = date_range
     
-    if all_logs:
-        df_logs = pd.DataFrame(all_logs)
-        
-        # Apply filters
-        if action_filter != "All":
-            df_logs = df_logs[df_logs['action'] == action_filter]
-        
-        if date_filter:
-            df_logs['date'] = pd.to_datetime(df_logs['timestamp']).dt.date
-            df_logs = df_logs[df_logs['date'] == date_filter]
-        
-        df_logs = df_logs.head(limit)
+    filters = {
+        'action': None if action_filter == "All" else action_filter,
+        'user_id': user_ids[user_filter],
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    
+    # Start from the newest page whenever the filters change
+    page_key = (tuple(filters.items()), limit)
+    if st.session_state.get('audit_page_key') != page_key:
+        st.session_state.audit_page_key = page_key
+        st.session_state.audit_cursor = {}
+    
+    # Only the newest page is live
+    run_every = _auto_refresh_controls("audit_logs") if not st.session_state.audit_cursor else None
+    st.fragment(_show_audit_log_page, run_every=run_every)(filters, limit)
+    
+    # Outside the fragment, so auto-refresh ticks keep a prepared download
+    _show_audit_log_export(filters)
+
+def _show_audit_log_export(filters):
+    """Export every log matching the filters, not just the page shown"""
+    if st.button("📦 Prepare Audit Log Export", key="audit_export"):
+        end_date = filters['end_date'] + timedelta(days=1) if filters['end_date'] else None
+        repository = get_repository()
+        sql, params = repository.logs_export_query(filters['action'], filters['user_id'], filters['start_date'], end_date)
+        try:
+            archived = repository.archived_logs(filters['action'], filters['user_id'], filters['start_date'], end_date)
+            path, row_count = export_query_to_csv(sql, params, prefix="audit_logs", extra_chunks=archived)
+            st.download_button(
+                label=f"📥 Export Audit Logs ({row_count:,} records)",
+                data=read_and_remove(path),
+                file_name=f"audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
+        except (Error, OSError) as e:
+            st.error(f"Export error: {e}")
+
+# Reruns on its own when auto-refresh is on
+@timed_render("Audit Log Page")
+def _show_audit_log_page(filters, limit):
+    page_cursor = st.session_state.audit_cursor
+    
+    # Fetch one extra row to learn whether another page exists; the newest
+    # page comes from the session's live feed, which fetches only new logs
+    new_logs = 0
+    if page_cursor:
+        logs = get_logs(limit=limit + 1, **filters, **page_cursor)
+    else:
+        logs, new_logs = get_log_feed('audit_logs', limit + 1, **filters)
+    if 'before' in page_cursor:
+        has_newer, has_older = len(logs) > limit, True
+        logs = logs[-limit:]
+    else:
+        has_newer, has_older = 'after' in page_cursor, len(logs) > limit
+        logs = logs[:limit]
+    
+    if logs:
+        df_logs = pd.DataFrame(logs)
         
         # Display logs
         st.dataframe(
@@ -73,26 +143,50 @@ def show_audit_logs():
             hide_index=True
         )
         
-        # Export logs
-        csv = df_logs.to_csv(index=False)
-        st.download_button(
-            label="📥 Export Audit Logs",
-            data=csv,
-            file_name=f"audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        # Page navigation
+        nav1, nav2, nav3 = st.columns([1, 2, 1])
+        with nav1:
+            if st.button("◀ Newer", key="audit_newer", disabled=not has_newer):
+                st.session_state.audit_cursor = {'before': (logs[0]['timestamp'], logs[0]['log_id'])}
+                st.rerun()
+        with nav2:
+            live = "" if page_cursor else f" · live, {new_logs} new at {datetime.now().strftime('%H:%M:%S')}"
+            st.caption(f"Showing {len(logs)} records from {logs[-1]['timestamp']} to {logs[0]['timestamp']}{live}")
+        with nav3:
+            if st.button("Older ▶", key="audit_older", disabled=not has_older):
+                st.session_state.audit_cursor = {'after': (logs[-1]['timestamp'], logs[-1]['log_id'])}
+                st.rerun()
     else:
         st.info("No audit logs found")
 
+@timed_render("Analytics")
 def show_analytics():
+    import plotly.express as px  # plotly loads with the first chart, not at startup
     st.markdown("### 📈 Real-Time Analytics")
     
-    daily_stats, action_stats = get_activity_stats() #type: ignore
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        range_label = st.selectbox("Time Range", list(ANALYTICS_RANGES), key="analytics_range")
+    today = datetime.now().date()
+    days = ANALYTICS_RANGES[range_label]
+    if days is None:
+        with col2:
+            selected = st.date_input("Date Range", (today - timedelta(days=30), today), max_value=today, key="analytics_dates")
+        if len(selected) != 2: #type: ignore
+            st.info("Select a start and end date")
+            return
+        start_date, end_date = selected #type: ignore
+    else:
+        start_date, end_date = today - timedelta(days=days - 1), today
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    
+    daily_stats, action_stats, heatmap_data = get_activity_stats(start, end) #type: ignore
     
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("#### Daily Activity (Last 7 Days)")
+        st.markdown(f"#### Daily Activity ({range_label})")
         if daily_stats:
             df_daily = pd.DataFrame(daily_stats)
             fig = px.line(df_daily, x='date', y='count', markers=True,
@@ -113,62 +207,74 @@ def show_analytics():
         else:
             st.info("No action data available")
     
-    # User activity heatmap
+    # User activity heatmap; longer ranges fold into day of week
     st.markdown("#### Activity Heatmap")
-    try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT DATE(timestamp) as date, HOUR(timestamp) as hour, COUNT(*) as count
-                FROM logs
-                WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                GROUP BY DATE(timestamp), HOUR(timestamp)
-            """)
-            heatmap_data = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            
-            if heatmap_data:
-                df_heat = pd.DataFrame(heatmap_data)
-                pivot_data = df_heat.pivot_table(values='count', index='hour', columns='date', fill_value=0)
-                fig = px.imshow(pivot_data, 
-                               labels=dict(x="Date", y="Hour of Day", color="Activity Count"),
-                               title="Activity Heatmap (Last 7 Days)")
-                st.plotly_chart(fig, use_container_width=True)
-    except Error as e:
-        st.error(f"Error loading analytics: {e}")
+    if heatmap_data:
+        df_heat = pd.DataFrame(heatmap_data)
+        if (end_date - start_date).days > 31:
+            df_heat['day'] = pd.to_datetime(df_heat['date']).dt.day_name()
+            pivot_data = df_heat.pivot_table(values='count', index='hour', columns='day', aggfunc='sum', fill_value=0)
+            pivot_data = pivot_data.reindex(columns=[d for d in WEEKDAYS if d in pivot_data.columns])
+            x_label = "Day of Week"
+        else:
+            pivot_data = df_heat.pivot_table(values='count', index='hour', columns='date', fill_value=0)
+            x_label = "Date"
+        fig = px.imshow(pivot_data, 
+                       labels=dict(x=x_label, y="Hour of Day", color="Activity Count"),
+                       title=f"Activity Heatmap ({range_label})")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No activity data available")
 
+@timed_render("GDPR Settings")
 def show_gdpr_settings():
     st.markdown("### ⚙️ GDPR Compliance Settings")
     
     # Data retention check
     st.markdown("#### 📅 Data Retention Management")
-    expired = check_data_retention()
+    try:
+        total = get_overview_metrics()['expired_records']
+    except Error as e:
+        st.error(f"Error checking retention: {e}")
+        total = 0
     
-    if expired:
-        st.warning(f"⚠️ {len(expired)} patient record(s) have exceeded retention period!")
-        df_expired = pd.DataFrame(expired)
-        st.dataframe(df_expired, use_container_width=True, hide_index=True)
+    if total:
+        st.warning(f"⚠️ {total:,} patient record(s) have exceeded retention period!")
+        
+        # One keyset page of the expired records, oldest retention date first
+        page_size = 50
+        page_cursor = st.session_state.get('retention_cursor')
+        expired = check_data_retention(limit=page_size + 1, after=page_cursor)
+        has_more = len(expired) > page_size
+        expired = expired[:page_size]
+        if expired:
+            st.dataframe(pd.DataFrame(expired), use_container_width=True, hide_index=True)
+        nav1, nav2 = st.columns(2)
+        with nav1:
+            if st.button("⏮ Oldest", key="retention_first", disabled=page_cursor is None):
+                st.session_state.retention_cursor = None
+                st.rerun()
+        with nav2:
+            if st.button("Next ▶", key="retention_next", disabled=not has_more):
+                st.session_state.retention_cursor = (expired[-1]['data_retention_date'], expired[-1]['patient_id'])
+                st.rerun()
         
         if st.button("🗑️ Delete Expired Records"):
+            progress = st.progress(0.0, text="Deleting expired records...")
             try:
-                connection = create_connection()
-                if connection:
-                    cursor = connection.cursor()
-                    cursor.execute("DELETE FROM patients WHERE data_retention_date < CURDATE()")
-                    deleted_count = cursor.rowcount
-                    connection.commit()
-                    cursor.close()
-                    connection.close()
-                    
-                    log_activity(
-                        st.session_state.user_id,
-                        st.session_state.role,
-                        "Data Retention",
-                        f"Deleted {deleted_count} expired records"
+                summary = purge_expired(
+                    st.session_state.user_id,
+                    st.session_state.role,
+                    progress_callback=lambda s: progress.progress(
+                        min(s['deleted'] / total, 1.0),
+                        text=f"Deleted {s['deleted']:,} of {total:,} expired records"
                     )
-                    st.success(f"Deleted {deleted_count} expired record(s)")
+                )
+                if summary['skipped']:
+                    st.warning("A retention purge is already running; try again shortly")
+                else:
+                    st.success(f"Deleted {summary['deleted']} expired record(s)")
+                    st.session_state.retention_cursor = None
                     st.rerun()
             except Error as e:
                 st.error(f"Error deleting records: {e}")
@@ -179,15 +285,40 @@ def show_gdpr_settings():
     
     # Encryption settings
     st.markdown("#### 🔐 Encryption Settings")
+    import crypto_service
+    from db.key_rotation import rotate_in_background, rotation_status
+    keys = config.ENCRYPTION_KEYS
+    fingerprint = crypto_service.key_fingerprint(keys[0])
     col1, col2 = st.columns(2)
     
+    # Keys are never displayed; fingerprints identify them
     with col1:
-        st.info(f"**Encryption Key Active**\n\nFernet symmetric encryption is enabled for reversible anonymization.")
+        st.info(f"**Encryption Key Active**\n\nFernet symmetric encryption is enabled for reversible anonymization. "
+                f"Primary key `{fingerprint}`, {len(keys)} key(s) in ENCRYPTION_KEYS.")
     
     with col2:
-        if st.button("🔑 View Encryption Key"):
-            st.code(ENCRYPTION_KEY.decode(), language="text")
-            st.warning("⚠️ Keep this key secure! Loss will make data unrecoverable.")
+        try:
+            status = rotation_status()
+        except Error as e:
+            st.error(f"Error reading key rotation status: {e}")
+            status = None
+        if status is not None and status['finished_at'] and status['failed']:
+            st.warning(f"Rotation to `{fingerprint}` finished, but {status['failed']:,} field(s) could not be opened by any key; "
+                       "keep the older keys until they are investigated")
+        elif status is not None and status['finished_at']:
+            st.success(f"✅ All records re-encrypted under `{fingerprint}` ({status['finished_at']})"
+                       + (". Older keys can now be removed from ENCRYPTION_KEYS." if len(keys) > 1 else ""))
+        elif len(keys) > 1 or status is not None:
+            if status is not None:
+                done = status['last_patient_id'] / status['max_patient_id'] if status['max_patient_id'] else 1.0
+                st.progress(min(done, 1.0), text=f"Rotation to `{fingerprint}`: {status['rotated']:,} records re-encrypted "
+                                                 f"(through patient ID {status['last_patient_id']:,} of {status['max_patient_id']:,})")
+            if st.button("🔄 Start / Resume Key Rotation"):
+                rotate_in_background(st.session_state.user_id, st.session_state.role)
+                st.info("Rotation is running in the background; reopen this tab to follow its progress")
+        else:
+            st.caption("To rotate, put a new key first in ENCRYPTION_KEYS (old keys after it), restart, "
+                       "then rotate here or with `python -m db.key_rotation`.")
     
     st.markdown("---")
     
@@ -213,57 +344,86 @@ def show_gdpr_settings():
     st.markdown("#### 💾 System Backup")
     if st.button("📦 Create Full Backup"):
         try:
-            connection = create_connection()
-            if connection:
-                cursor = connection.cursor(dictionary=True)
-                
-                # Export all tables
-                cursor.execute("SELECT * FROM patients")
-                patients_backup = cursor.fetchall()
-                
-                cursor.execute("SELECT * FROM logs")
-                logs_backup = cursor.fetchall()
-                
-                cursor.close()
-                connection.close()
-                
-                # Create backup files
-                backup_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-                
-                df_patients = pd.DataFrame(patients_backup)
-                df_logs = pd.DataFrame(logs_backup)
-                
-                patients_csv = df_patients.to_csv(index=False)
-                logs_csv = df_logs.to_csv(index=False)
-                
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    st.download_button(
-                        "📥 Download Patients Backup",
-                        patients_csv,
-                        file_name=f"patients_backup_{backup_time}.csv",
-                        mime="text/csv"
-                    )
-                with col_b:
-                    st.download_button(
-                        "📥 Download Logs Backup",
-                        logs_csv,
-                        file_name=f"logs_backup_{backup_time}.csv",
-                        mime="text/csv"
-                    )
-                
-                st.success("Backup created successfully!")
-                log_activity(
-                    st.session_state.user_id,
-                    st.session_state.role,
-                    "System Backup",
-                    "Full system backup created"
+            with st.spinner("Streaming tables to compressed backup files..."):
+                backup_queries = get_repository().table_backup_queries()
+                patients_path, patient_rows = export_query_to_csv(*backup_queries['patients'], compress=True, prefix="patients_backup")
+                logs_path, log_rows = export_query_to_csv(*backup_queries['logs'], compress=True, prefix="logs_backup")
+            
+            # Create backup files
+            backup_time = datetime.now().strftime('%Y%m%d_%H%M%S')
+            
+            col_a, col_b = st.columns(2)
+            with col_a:
+                st.download_button(
+                    "📥 Download Patients Backup",
+                    read_and_remove(patients_path),
+                    file_name=f"patients_backup_{backup_time}.csv.gz",
+                    mime="application/gzip"
                 )
-        except Error as e:
+            with col_b:
+                st.download_button(
+                    "📥 Download Logs Backup",
+                    read_and_remove(logs_path),
+                    file_name=f"logs_backup_{backup_time}.csv.gz",
+                    mime="application/gzip"
+                )
+            
+            st.success(f"Backup created successfully! ({patient_rows:,} patients, {log_rows:,} log entries)")
+            log_activity(
+                st.session_state.user_id,
+                st.session_state.role,
+                "System Backup",
+                "Full system backup created"
+            )
+        except (Error, OSError) as e:
+            st.error(f"Backup error: {e}")
+    
+    # Parquet backup chain (full snapshot + incrementals)
+    st.markdown("#### 🗂️ Incremental Backups (Parquet)")
+    # Parquet backups read MySQL column metadata and snapshots
+    if not get_repository().supports_parquet_backup:
+        st.info("Parquet backups need the MySQL backend; back up the SQLite database file instead")
+        return
+    from db.backup import load_manifest, run_backup
+    col_full, col_incr = st.columns(2)
+    backup_kind = None
+    with col_full:
+        if st.button("🧱 Full Snapshot", key="parquet_full"):
+            backup_kind = "full"
+    with col_incr:
+        if st.button("➕ Incremental Backup", key="parquet_incremental"):
+            backup_kind = "incremental"
+    
+    if backup_kind:
+        try:
+            with st.spinner("Writing Parquet backup..."):
+                entry = run_backup(backup_kind)
+            summary = ", ".join(f"{rows:,} {table}" for table, rows in entry['rows'].items())
+            st.success(f"{entry['type'].title()} backup {entry['id']} written ({summary})")
+            log_activity(
+                st.session_state.user_id,
+                st.session_state.role,
+                "System Backup",
+                f"{entry['type'].title()} Parquet backup {entry['id']}: {summary}"
+            )
+        except (Error, OSError) as e:
             st.error(f"Backup error: {e}")
+    
+    backups = load_manifest()
+    if backups:
+        st.dataframe(
+            pd.DataFrame([{'id': entry['id'], 'type': entry['type'], 'created_at': entry['created_at'], **entry['rows']}
+                          for entry in reversed(backups)]),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption("Restore with `python -m db.backup restore --database <target>`")
 
+@timed_render("Add Patient")
 def show_add_patient():
     st.markdown("### ➕ Add New Patient")
+    import crypto_service
+    can_encrypt = crypto_service.encryption_enabled()
     
     with st.form("add_patient_form"):
         col1, col2 = st.columns(2)
@@ -274,13 +434,26 @@ def show_add_patient():
         
         with col2:
             diagnosis = st.text_area("Diagnosis*", placeholder="Enter diagnosis details...")
-            use_encryption = st.checkbox("🔐 Enable Fernet Encryption (Reversible)", value=True)
+            # Off while ENCRYPTION_KEYS is the public default (see config)
+            use_encryption = st.checkbox("🔐 Enable Fernet Encryption (Reversible)", value=can_encrypt, disabled=not can_encrypt)
+            allow_duplicate = st.checkbox("Register even if the contact number is already on file", value=False,
+                                          disabled=not crypto_service.blind_index_enabled())
         
         st.markdown("---")
         submitted = st.form_submit_button("➕ Add Patient")
         
         if submitted:
-            if name and contact and diagnosis:
+            # Indexed lookup on the contact's blind index; nothing is decrypted
+            duplicates = [] if allow_duplicate or not contact else find_duplicate_patients(name, contact)
+            if duplicates:
+                same_name = [str(d['patient_id']) for d in duplicates if d['same_name']]
+                st.warning(
+                    f"This contact number is already on file for patient ID(s) "
+                    f"{', '.join(str(d['patient_id']) for d in duplicates)}"
+                    + (f" (same name: {', '.join(same_name)})" if same_name else "")
+                    + ". Tick 'Register even if the contact number is already on file' to add a new record anyway."
+                )
+            elif name and contact and diagnosis:
                 if add_patient(name, contact, diagnosis, encrypt=use_encryption):
                     st.success(f"Patient '{name}' added successfully!")
                     if use_encryption:
@@ -289,33 +462,64 @@ def show_add_patient():
             else:
                 st.error("Please fill all required fields!")
     
+    # Bulk import from file
+    with st.expander("📤 Bulk Import (CSV / Parquet)"):
+        st.caption("Required columns: name, contact, diagnosis. Optional: data_retention_date (YYYY-MM-DD).")
+        upload = st.file_uploader("Patient file", type=["csv", "parquet"], key="bulk_import_file")
+        import_encrypted = st.checkbox("🔐 Encrypt names and contacts", value=can_encrypt, disabled=not can_encrypt,
+                                       key="bulk_import_encrypt")
+        
+        if upload is not None and st.button("📤 Import Patients", key="bulk_import_button"):
+            from db.patient_import import import_patients
+            progress = st.empty()
+            # A private file per import: rejected rows are raw patient data
+            fd, rejects_path = tempfile.mkstemp(prefix="rejects_", suffix=".csv", dir=config.EXPORT_DIR)
+            os.close(fd)
+            try:
+                summary = import_patients(
+                    upload,
+                    st.session_state.user_id,
+                    st.session_state.role,
+                    encrypt=import_encrypted,
+                    source_name=upload.name,
+                    rejects_path=rejects_path,
+                    progress_callback=lambda s: progress.info(f"{s['imported']:,} imported, {s['rejected']:,} rejected...")
+                )
+                progress.empty()
+                col_a, col_b, col_c = st.columns(3)
+                col_a.metric("Imported", f"{summary['imported']:,}")
+                col_b.metric("Rejected", f"{summary['rejected']:,}")
+                col_c.metric("Throughput", f"{summary['rows_per_second']:,.0f} rows/s")
+                if summary['rejects_path']:
+                    st.download_button(
+                        "📥 Download Rejected Rows",
+                        read_and_remove(summary['rejects_path']),
+                        file_name=f"rejected_{upload.name}.csv",
+                        mime="text/csv"
+                    )
+            except (Error, ValueError, OSError) as e:
+                st.error(f"Import error: {e}")
+            finally:
+                if os.path.exists(rejects_path):
+                    os.remove(rejects_path)
+    
     st.markdown("---")
     
     # Show recent additions (for receptionist)
     st.markdown("### 📋 Recent Additions")
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT patient_id, date_added 
-                FROM patients 
-                ORDER BY date_added DESC 
-                LIMIT 10
-            """)
-            recent = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            
-            if recent:
-                df_recent = pd.DataFrame(recent)
-                st.dataframe(df_recent, use_container_width=True, hide_index=True)
-            else:
-                st.info("No records yet")
+        recent = get_repository().recent_additions()
+        
+        if recent:
+            df_recent = pd.DataFrame(recent)
+            st.dataframe(df_recent, use_container_width=True, hide_index=True)
+        else:
+            st.info("No records yet")
     except Error as e:
         st.error(f"Error: {e}")
 
 # GDPR Consent Banner
+@timed_render("Consent Banner")
 def show_consent_banner():
     if not st.session_state.consent_given:
         st.markdown("""
@@ -346,108 +550,248 @@ def show_consent_banner():
         return False
     return True
 
+@timed_render("Overview")
 def show_overview():
     st.markdown("### 📊 System Overview")
     
-    # Get statistics
+    # Get statistics (cached process-wide for a few seconds)
     try:
-        connection = create_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            cursor.execute("SELECT COUNT(*) as count FROM patients")
-            total_patients = cursor.fetchone()['count'] #type: ignore 
-            
-            cursor.execute("SELECT COUNT(*) as count FROM patients WHERE is_anonymized = TRUE")
-            anonymized_patients = cursor.fetchone()['count'] #type: ignore 
-            
-            cursor.execute("SELECT COUNT(*) as count FROM logs WHERE DATE(timestamp) = CURDATE()")
-            today_activities = cursor.fetchone()['count'] #type: ignore 
-            
-            cursor.execute("SELECT COUNT(*) as count FROM patients WHERE data_retention_date < CURDATE()")
-            expired_records = cursor.fetchone()['count'] #type: ignore 
-            
-            cursor.close()
-            connection.close()
-            
-            # Display metrics
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("Total Patients", total_patients, delta=None) #type: ignore
-            with col2:
-                st.metric("Anonymized Records", anonymized_patients, #type: ignore
-                         delta=f"{(anonymized_patients/total_patients*100):.1f}%" if total_patients > 0 else "0%") #type: ignore
-            with col3:
-                st.metric("Today's Activities", today_activities) #type: ignore
-            with col4:
-                st.metric("⚠️ Expired Records", expired_records,  #type: ignore
-                         delta="Action Required" if expired_records > 0 else "All Current", #type: ignore
-                         delta_color="inverse")
-            
-            # Recent activity
-            st.markdown("### 📋 Recent Activity")
-            recent_logs = get_logs()[:10] #type: ignore
-            if recent_logs:
-                df_logs = pd.DataFrame(recent_logs)
-                df_logs = df_logs[['timestamp', 'username', 'role', 'action', 'details']]
-                st.dataframe(df_logs, use_container_width=True, hide_index=True)
-            else:
-                st.info("No recent activity")
-    
+        metrics = get_overview_metrics()
+        total_patients = metrics['total_patients'] #type: ignore
+        anonymized_patients = metrics['anonymized_patients'] #type: ignore
+        today_activities = metrics['today_activities'] #type: ignore
+        expired_records = metrics['expired_records'] #type: ignore
+        
+        # Display metrics
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Total Patients", total_patients, delta=None) #type: ignore
+        with col2:
+            st.metric("Anonymized Records", anonymized_patients, #type: ignore
+                     delta=f"{(anonymized_patients/total_patients*100):.1f}%" if total_patients > 0 else "0%") #type: ignore
+        with col3:
+            st.metric("Today's Activities", today_activities) #type: ignore
+        with col4:
+            st.metric("⚠️ Expired Records", expired_records,  #type: ignore
+                     delta="Action Required" if expired_records > 0 else "All Current", #type: ignore
+                     delta_color="inverse")
+        
+        # Recent activity
+        st.markdown("### 📋 Recent Activity")
+        st.fragment(_show_recent_activity, run_every=_auto_refresh_controls("recent_activity"))()
+
     except Error as e:
         st.error(f"Error loading overview: {e}")
 
+def _auto_refresh_controls(key):
+    """Auto-refresh toggle and interval for a live log view; returns seconds between refreshes, or None"""
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        auto_refresh = st.toggle("🔄 Auto-refresh", key=f"{key}_auto_refresh")
+    with col2:
+        interval = st.selectbox("Refresh every", config.LOG_FEED_REFRESH_OPTIONS, key=f"{key}_refresh_interval",
+                                format_func=lambda seconds: f"every {seconds} s", disabled=not auto_refresh,
+                                label_visibility="collapsed")
+    return interval if auto_refresh else None
+
+# Reruns on its own when auto-refresh is on; each run fetches only new logs
+@timed_render("Recent Activity")
+def _show_recent_activity():
+    recent_logs, _ = get_log_feed('recent_activity', 10)
+    if recent_logs:
+        df_logs = pd.DataFrame(recent_logs)
+        df_logs = df_logs[['timestamp', 'username', 'role', 'action', 'details']]
+        st.dataframe(df_logs, use_container_width=True, hide_index=True)
+    else:
+        st.info("No recent activity")
+
+@timed_render("Patients")
 def show_patients():
     st.markdown("### 👥 Patient Records")
     
-    patients = get_patients(st.session_state.role)
+    role = st.session_state.role
+    anonymized_view = False
     
-    if patients:
-        df = pd.DataFrame(patients)
-        
-        if st.session_state.role == 'admin':
-            st.markdown("**Full Access Mode** - Viewing all patient data")
-            
-            # Toggle between raw and anonymized view
-            view_mode = st.radio("View Mode:", ["Raw Data", "Anonymized Data"], horizontal=True)
-            
-            if view_mode == "Raw Data":
-                display_df = df[['patient_id', 'name', 'contact', 'diagnosis', 'date_added', 'data_retention_date']]
-            else:
-                display_df = df[['patient_id', 'anonymized_name', 'anonymized_contact', 'diagnosis', 'date_added']]
-                display_df.columns = ['patient_id', 'name', 'contact', 'diagnosis', 'date_added']
-        
-        elif st.session_state.role == 'doctor':
-            st.markdown("**Anonymized View** - Patient identities are protected")
-            display_df = df[['patient_id', 'name', 'contact', 'diagnosis', 'date_added']]
-        
-        else:  # receptionist
-            st.markdown("**Limited Access** - Sensitive data is hidden")
-            display_df = df[['patient_id', 'date_added']]
+    if role == 'admin':
+        st.markdown("**Full Access Mode** - Viewing all patient data")
         
+        # Toggle between raw and anonymized view
+        view_mode = st.radio("View Mode:", ["Raw Data", "Anonymized Data"], horizontal=True)
+        anonymized_view = view_mode == "Anonymized Data"
+    elif role == 'doctor':
+        st.markdown("**Anonymized View** - Patient identities are protected")
+    else:  # receptionist
+        st.markdown("**Limited Access** - Sensitive data is hidden")
+    
+    # Full-text search replaces the listing while a query is entered
+    search = ""
+    if role in ['admin', 'doctor']:
+        label, placeholder = (("🔍 Search diagnosis, patient ID or contact number", "e.g. asthma, diab, 1042, 555-123-4567")
+                              if role == 'admin' else ("🔍 Search diagnosis or patient ID", "e.g. asthma, diab, 1042"))
+        search = st.text_input(label, key="patients_search", placeholder=placeholder).strip()
+    
+    page_size = st.selectbox("Records per page:", [25, 50, 100, 200], index=1, key="patients_page_size")
+    
+    if search:
+        _show_search_results(role, search, page_size, anonymized_view)
+        return
+    
+    # Start from the newest page whenever the view changes
+    page_key = (role, anonymized_view, page_size)
+    if st.session_state.get('patients_page_key') != page_key:
+        st.session_state.patients_page_key = page_key
+        st.session_state.patients_cursor = {}
+        st.session_state.patients_page_number = 1
+    page_cursor = st.session_state.patients_cursor
+    
+    # Fetch one extra row to learn whether another page exists
+    patients = get_patients(role, limit=page_size + 1, anonymized_view=anonymized_view, **page_cursor)
+    if 'before' in page_cursor:
+        has_newer, has_older = len(patients) > page_size, True
+        patients = patients[-page_size:]
+    else:
+        has_newer, has_older = 'after' in page_cursor, len(patients) > page_size
+        patients = patients[:page_size]
+    
+    if patients:
+        display_df = pd.DataFrame(patients)
         st.dataframe(display_df, use_container_width=True, hide_index=True)
         
+        # Page navigation
+        total = count_patients(role)
+        page_number = st.session_state.patients_page_number
+        nav1, nav2, nav3 = st.columns([1, 2, 1])
+        with nav1:
+            if st.button("◀ Newer", key="patients_newer", disabled=not has_newer):
+                st.session_state.patients_cursor = {'before': patients[0]['patient_id']}
+                st.session_state.patients_page_number = max(page_number - 1, 1)
+                st.rerun()
+        with nav2:
+            st.caption(f"Page {page_number} of {max(-(-total // page_size), 1)} · {total:,} records")
+        with nav3:
+            if st.button("Older ▶", key="patients_older", disabled=not has_older):
+                st.session_state.patients_cursor = {'after': patients[-1]['patient_id']}
+                st.session_state.patients_page_number = page_number + 1
+                st.rerun()
+        
         # Export option
-        if st.session_state.role in ['admin', 'doctor']:
-            csv = display_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Export to CSV",
-                data=csv,
-                file_name=f"patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
-            
-            if st.session_state.role == 'admin':
-                # Individual anonymization
-                st.markdown("---")
-                st.markdown("### 🔒 Individual Anonymization")
-                patient_ids = df['patient_id'].tolist()
-                selected_id = st.selectbox("Select Patient ID to Anonymize:", patient_ids)
-                
-                if st.button("Anonymize Selected Patient"):
-                    if anonymize_patient_data(selected_id):
-                        st.success(f"Patient ID {selected_id} has been anonymized!")
-                        st.rerun()
+        if role in ['admin', 'doctor']:
+            if st.button("📦 Prepare CSV Export", key="patients_export"):
+                sql, params = get_repository().patients_export_query(patient_view(role, anonymized_view))
+                try:
+                    path, row_count = export_query_to_csv(sql, params, prefix="patients")
+                    st.download_button(
+                        label=f"📥 Export to CSV ({row_count:,} records)",
+                        data=read_and_remove(path),
+                        file_name=f"patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv"
+                    )
+                except (Error, OSError) as e:
+                    st.error(f"Export error: {e}")
     else:
         st.info("No patient records found")
+
+def _show_search_results(role, search, page_size, anonymized_view):
+    """Ranked search results for show_patients, one page at a time"""
+    # Back to the first page whenever the query or view changes
+    search_key = (role, anonymized_view, page_size, search)
+    if st.session_state.get('patients_search_key') != search_key:
+        st.session_state.patients_search_key = search_key
+        st.session_state.patients_search_offset = 0
+    offset = st.session_state.patients_search_offset
+    
+    # Fetch one extra row to learn whether another page exists
+    patients = search_patients(role, search, limit=page_size + 1, offset=offset, anonymized_view=anonymized_view)
+    has_more = len(patients) > page_size
+    patients = patients[:page_size]
+    
+    if not patients:
+        st.info("No matching patients" if offset == 0 else "No more matches")
+        return
+    
+    df_results = pd.DataFrame(patients)
+    df_results['relevance'] = df_results['relevance'].astype(float).round(2)
+    st.dataframe(df_results, use_container_width=True, hide_index=True)
+    
+    nav1, nav2, nav3 = st.columns([1, 2, 1])
+    with nav1:
+        if st.button("◀ Better matches", key="search_previous", disabled=offset == 0):
+            st.session_state.patients_search_offset = max(offset - page_size, 0)
+            st.rerun()
+    with nav2:
+        st.caption(f"Matches {offset + 1:,}–{offset + len(patients):,}, best first")
+    with nav3:
+        if st.button("More matches ▶", key="search_next", disabled=not has_more):
+            st.session_state.patients_search_offset = offset + page_size
+            st.rerun()
+
+@timed_render("Performance")
+def show_performance():
+    st.markdown("### ⏱️ Performance")
+    st.caption("Since this server process started (percentiles over the last 1,000 observations of each).")
+    
+    def ms(seconds):
+        return round(seconds * 1000, 1) if seconds is not None else None
+    
+    # Render time per page
+    st.markdown("#### Pages")
+    renders = instrumentation.render_stats()
+    if renders:
+        df_renders = pd.DataFrame([{
+            'Page': r['page'], 'Renders': r['count'],
+            'p50 (ms)': ms(r['p50']), 'p95 (ms)': ms(r['p95']), 'p99 (ms)': ms(r['p99']), 'Max (ms)': ms(r['max']),
+            'Queries / render': round(r['mean_queries'], 1), 'Connections / render': round(r['mean_connections'], 1),
+        } for r in sorted(renders, key=lambda r: r['p95'] or 0, reverse=True)])
+        st.dataframe(df_renders, use_container_width=True, hide_index=True)
+    else:
+        st.info("No renders recorded yet")
+    
+    # Slowest statements
+    st.markdown("#### Slowest Queries")
+    statements = sorted(instrumentation.query_stats(), key=lambda q: q['p95'] or 0, reverse=True)
+    if statements:
+        df_queries = pd.DataFrame([{
+            'Statement': q['statement'], 'Calls': q['count'],
+            'p50 (ms)': ms(q['p50']), 'p95 (ms)': ms(q['p95']), 'p99 (ms)': ms(q['p99']), 'Max (ms)': ms(q['max']),
+            'Total (s)': round(q['total'], 2), 'Rows / call': round(q['mean_rows'], 1),
+        } for q in statements[:20]])
+        st.dataframe(df_queries, use_container_width=True, hide_index=True)
+    else:
+        st.info("No queries recorded yet")
+    
+    # Connections and background writer
+    connections = instrumentation.connection_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Connection Checkouts", f"{connections['count']:,}")
+    with col2:
+        st.metric("Checkout p95", f"{ms(connections['p95']) or 0} ms")
+    with col3:
+        st.metric("Checkout p99", f"{ms(connections['p99']) or 0} ms")
+    with col4:
+        st.metric("Checkout Max", f"{ms(connections['max'])} ms")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Connection Pool**")
+        try:
+            st.json(get_repository().pool_stats())
+        except Error as e:
+            st.error(f"Error reading pool stats: {e}")
+    with col2:
+        st.markdown("**Audit Log Writer**")
+        st.json(get_audit_writer().stats())
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Download Prometheus Metrics",
+            data=instrumentation.prometheus_text(),
+            file_name=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prom",
+            mime="text/plain"
+        )
+    with col2:
+        if st.button("🔄 Reset Measurements", key="performance_reset"):
+            instrumentation.reset()
+            st.rerun()